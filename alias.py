@@ -0,0 +1,52 @@
+from typing import List, Sequence, Tuple
+
+
+def alias_table(weights: Sequence[float]) -> Tuple[List[float], List[int]]:
+    """
+    Build Vose's alias table of non-negative weights in O(n).
+
+    :return: for every column, the probability of keeping its own index and the index it otherwise aliases to
+    """
+    n = len(weights)
+    total = sum(weights)
+    if n == 0 or total <= 0:
+        raise ValueError('Weights must have a positive total')
+
+    scaled = [w * n / total for w in weights]
+    probability = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, s in enumerate(scaled) if s < 1.0]
+    large = [i for i, s in enumerate(scaled) if s >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        probability[s] = scaled[s]
+        alias[s] = l
+        # The large column gives the small one what it is missing
+        scaled[l] += scaled[s] - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+    # Whatever is left is 1 up to float error, so keeps its own index
+    return probability, alias
+
+
+class AliasTable:
+    """
+    Samples an index with probability proportional to its weight in O(1),
+    from a single uniform number, after an O(n) build.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        self.probability, self.alias = alias_table(weights)
+        self.__n: int = len(weights)
+
+    def sample(self, u: float) -> int:
+        """
+        :param u: uniform number in [0, 1)
+        """
+        # u * n stays below n for every double below 1, so the column is always in range
+        x = u * self.__n
+        i = int(x)
+        return i if x - i < self.probability[i] else self.alias[i]
+
+    def __len__(self) -> int:
+        return self.__n
@@ -0,0 +1,118 @@
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from engine import Engine, RESUM_INTERVAL
+from history import History
+from landscape import Landscape
+from rng import RandomStream
+from sum_tree import SumTree
+
+
+class ArrayEngine(Engine):
+    """
+    Direct method engine working on flat arrays compiled from a `Landscape`.
+
+    Follows the same event rules as `Simulation`, but sizes and rates are held
+    in `array` buffers indexed by type, so no `Type` attributes or `Event` dict
+    lookups happen per event. Results are written back to the `Type`s by `sync`.
+    """
+
+    def __init__(self, landscape: Landscape, pop_max: int, history: Optional[History] = None,
+                 rng: RandomStream = None):
+        """
+        :param landscape: compiled types to simulate
+        :param pop_max: population size at which births are paired with a death
+        :param history: optional history to record to after every event
+        :param rng: random stream to draw from, a new unseeded one if not given
+        """
+        super().__init__(landscape, pop_max, history, rng)
+        self.__changes: List[Tuple[int, int]] = []
+
+        self.sizes: array = array('i', landscape.initial_sizes.tolist())
+        self.max_sizes: array = array('i', self.sizes)
+        self.size: int = sum(self.sizes)
+
+        # Shared with every other engine on the landscape, only read
+        buffers = landscape.buffers()
+        self.__birth_rates: array = buffers['birth']
+        self.__death_rates: array = buffers['death']
+        self.__sample_mutation = landscape.sample_mutation
+
+        self.__birth = SumTree([r * s for r, s in zip(self.__birth_rates, self.sizes)])
+        self.__death = SumTree([r * s for r, s in zip(self.__death_rates, self.sizes)])
+
+    def advance(self, until: float, max_events: int = None) -> int:
+        """
+        Run events until time passes `until` or `max_events` events have happened.
+
+        :return: number of events run
+        """
+        n = 0
+        while self.time < until and (max_events is None or n < max_events):
+            if self.__birth.total + self.__death.total <= 0:
+                # Nothing can happen any more
+                self.time = until
+                break
+            self.__cycle()
+            n += 1
+        return n
+
+    def __cycle(self) -> None:
+        birth, death = self.__birth, self.__death
+        total = birth.total + death.total
+        rng = self.rng
+        self.time += rng.standard_exponential() / total
+
+        n = rng.random() * total
+        if n < birth.total:
+            t = birth.find(n)
+            if self.size >= self.pop_max:
+                d = death.find(rng.random() * death.total)
+                # Only update with death if types are different, otherwise they cancel
+                if d != t and d < len(death):
+                    self.__apply(d, -1)
+                    m = self.__sample_mutation(t, rng.random())
+                    # A type already updated this event cannot be born into
+                    if m != d:
+                        self.__apply(m, 1)
+            elif t < len(birth):
+                self.__apply(self.__sample_mutation(t, rng.random()), 1)
+        else:
+            t = death.find(n - birth.total)
+            if t < len(death):
+                self.__apply(t, -1)
+
+        self.events += 1
+        if self.events % RESUM_INTERVAL == 0 or self.size == 0:
+            birth.rebuild()
+            death.rebuild()
+
+        if self.history is not None:
+            self.history.record(self.time, self.sizes, self.__changes)
+        self.__changes = []
+
+    def __apply(self, i: int, change: int) -> None:
+        s = self.sizes[i] + change
+        self.sizes[i] = s
+        if s > self.max_sizes[i]:
+            self.max_sizes[i] = s
+        self.size += change
+        self.__changes.append((i, change))
+        self.__birth.set(i, self.__birth_rates[i] * s)
+        self.__death.set(i, self.__death_rates[i] * s)
+
+    def getstate(self) -> Dict:
+        """
+        Sizes, time and the propensity trees as they are, so a restored engine
+        continues exactly, the random stream is saved separately.
+        """
+        return dict(super().getstate(), birth=self.__birth, death=self.__death)
+
+    def setstate(self, state: Dict) -> None:
+        super().setstate(state)
+        self.sizes = array('i', state['sizes'])
+        self.max_sizes = array('i', state['max_sizes'])
+        self.size = sum(self.sizes)
+        self.__birth = state['birth']
+        self.__death = state['death']
+        self.__changes = []
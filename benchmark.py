@@ -0,0 +1,161 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+from os.path import getsize, join
+from typing import Dict, List, NamedTuple
+
+import results
+from results import Result
+from simulation_generator import Generator
+
+parser = argparse.ArgumentParser('benchmark')
+parser.add_argument('-l', help='numbers of loci, comma separated', type=str, default='1,2,4,8,12')
+parser.add_argument('-s', help='population maximums, comma separated', type=str, default='1000,10000')
+parser.add_argument('-t', help='simulation times to run to, comma separated', type=str, default='0.1,1')
+parser.add_argument('-g', help='engines, comma separated', type=str, default='direct,array')
+parser.add_argument('-y', help='history policy recorded to disk, \'none\' to not record history',
+                    type=str, choices=['none', 'event', 'grid'], default='grid')
+parser.add_argument('-r', help='runs of each scenario, the fastest is reported', type=int, default=1)
+parser.add_argument('-n', help='seed of every run', type=int, default=0)
+parser.add_argument('-o', help='JSON file to write the results to', type=str, default='data/benchmark.json')
+parser.add_argument('-c', help='JSON file of an earlier benchmark to compare with', type=str, default=None)
+parser.add_argument('-x', help='fraction slower in events/s counted as a regression when comparing',
+                    type=float, default=0.1)
+args = parser.parse_args()
+
+# Rates of every type, and of the fully mutated type which is fitter
+DEFAULT_RATE = (10.0, 9.0)
+FINAL_RATE = (10.0, 5.0)
+GENES = 'abcdefghijklmnopqrstuvwxyz'
+
+
+class Scenario(NamedTuple):
+    loci: int
+    size: int
+    time: float
+    engine: str
+
+    @property
+    def name(self) -> str:
+        return '{}-loci{}-size{}-t{}'.format(self.engine, self.loci, self.size, self.time)
+
+
+def scenarios(loci: List[int], sizes: List[int], times: List[float], engines: List[str]) -> List[Scenario]:
+    return [Scenario(l, s, t, e) for e in engines for l in loci for s in sizes for t in times]
+
+
+def run_scenario(scenario: Scenario, seed: int, history: str) -> Dict:
+    """
+    Build and run one scenario, meant to be run in a fresh process so the peak
+    memory is of this scenario alone.
+    """
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    wildtype = tuple(GENES[:scenario.loci])
+    mutated = tuple(GENES[:scenario.loci].upper())
+    with tempfile.TemporaryDirectory() as folder:
+        kwargs = dict(engine=scenario.engine, seed=seed)
+        if history != 'none':
+            kwargs.update(history=history, history_file=join(folder, 'history'))
+
+        t0 = time.time()
+        sim = Generator(**kwargs).parameters(wildtype, [mutated], rates={mutated: FINAL_RATE},
+                                             default_rate=DEFAULT_RATE, size=scenario.size)
+        # Other engines compile the landscape when made, so the direct method's is counted in the build too
+        sim.get_landscape()
+        build = time.time() - t0
+        t0 = time.time()
+        sim.run(scenario.time)
+        wall = time.time() - t0
+
+        history_bytes = sum(getsize(p) for p in glob.glob(join(folder, 'history.*')))
+        result_file = join(folder, 'results.sim')
+        types = sim.get_types()
+        path = sim.get_landscape().dominant_path([t.size for t in types], [t.max_size for t in types])
+        results.save_results(result_file, sim.get_landscape(),
+                             [Result(path, seed, sim.get_stop_time(), sim.get_stop_reason(), 0)],
+                             time=scenario.time, seed=seed, replicates=1)
+        result_bytes = getsize(result_file)
+
+    events = sim.get_events()
+    return dict(scenario._asdict(), name=scenario.name, types=len(types), events=events, build_seconds=build,
+                wall_seconds=wall, events_per_second=events / wall if wall > 0 else None,
+                rss_start_kb=rss_start, peak_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                history_bytes=history_bytes, result_bytes=result_bytes)
+
+
+def benchmark(scenario: Scenario, seed: int, history: str, runs: int) -> Dict:
+    best = None
+    for _ in range(runs):
+        # One process per run, so memory left over from earlier runs isn't counted
+        with Pool(1) as pool:
+            measured = pool.apply(run_scenario, (scenario, seed, history))
+        if best is None or measured['wall_seconds'] < best['wall_seconds']:
+            best = measured
+    return best
+
+
+def revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.realpath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> bool:
+    """
+    Print the change in events per second of every scenario in both benchmarks.
+
+    :return: whether no scenario got slower by more than `tolerance`
+    """
+    before = {s['name']: s for s in baseline['scenarios']}
+    ok = True
+    print('{:<40} {:>14} {:>14} {:>8}'.format('scenario', 'before/s', 'after/s', 'ratio'))
+    for s in current['scenarios']:
+        b = before.get(s['name'])
+        if b is None or not b['events_per_second'] or not s['events_per_second']:
+            continue
+        ratio = s['events_per_second'] / b['events_per_second']
+        slower = ratio < 1.0 - tolerance
+        ok &= not slower
+        print('{:<40} {:>14.0f} {:>14.0f} {:>8.2f}{}'.format(s['name'], b['events_per_second'],
+                                                             s['events_per_second'], ratio,
+                                                             '  slower' if slower else ''))
+    return ok
+
+
+if __name__ == '__main__':
+    todo = scenarios([int(x) for x in args.l.split(',')], [int(x) for x in args.s.split(',')],
+                     [float(x) for x in args.t.split(',')], args.g.split(','))
+    report = {'revision': revision(), 'python': platform.python_version(), 'machine': platform.machine(),
+              'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seed': args.n, 'history': args.y, 'runs': args.r,
+              'scenarios': []}
+    for scenario in todo:
+        measured = benchmark(scenario, args.n, args.y, args.r)
+        report['scenarios'].append(measured)
+        print('{:<40} {:>10} events {:>8.2f}s {:>12.0f}/s {:>8} KiB peak'.format(
+            scenario.name, measured['events'], measured['wall_seconds'], measured['events_per_second'] or 0,
+            measured['peak_rss_kb']))
+
+    directory = os.path.dirname(args.o)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.o, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Written to {}'.format(args.o))
+
+    if args.c:
+        with open(args.c) as f:
+            if not compare(json.load(f), report, args.x):
+                sys.exit(1)
+
+# python benchmark.py -o data/benchmark-before.json
+# python benchmark.py -o data/benchmark-after.json -c data/benchmark-before.json
@@ -0,0 +1,30 @@
+import os
+import pickle
+from typing import Dict, Any
+
+FORMAT = 'checkpoint'
+VERSION = 1
+
+
+def save_checkpoint(filename: str, state: Dict[str, Any]) -> None:
+    """
+    Write a snapshot of a run. The file is replaced in one step, so a run killed
+    while writing leaves the previous snapshot intact.
+    """
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as f:
+        pickle.dump(dict(state, format=FORMAT, version=VERSION), f, -1)
+    os.replace(temporary, filename)
+
+
+def load_checkpoint(filename: str) -> Dict[str, Any]:
+    with open(filename, 'rb') as f:
+        state = pickle.load(f)
+    if not isinstance(state, dict) or state.get('format') != FORMAT:
+        raise ValueError('{} is not a checkpoint'.format(filename))
+    if state['version'] > VERSION:
+        raise ValueError('Checkpoint version {} is newer than supported'.format(state['version']))
+    return state
@@ -0,0 +1,61 @@
+import math
+from statistics import NormalDist
+from typing import Dict, Hashable, Iterable, NamedTuple, Tuple
+
+# Default confidence level of path frequency intervals
+CONFIDENCE = 0.95
+
+
+class Interval(NamedTuple):
+    """
+    Observed frequency of an outcome and its confidence interval.
+    """
+    frequency: float
+    low: float
+    high: float
+
+    @property
+    def width(self) -> float:
+        return self.high - self.low
+
+
+def wilson_interval(k: int, n: int, confidence: float = CONFIDENCE) -> Interval:
+    """
+    Wilson score interval of a proportion, which stays inside [0, 1] and
+    behaves for frequencies near 0 or 1 and small numbers of replicates.
+
+    :param k: number of replicates with the outcome
+    :param n: number of replicates
+    :param confidence: probability the interval covers the true frequency
+    """
+    if n == 0:
+        return Interval(0.0, 0.0, 1.0)
+    z = NormalDist().inv_cdf((1.0 + confidence) / 2.0)
+    p = k / n
+    denominator = 1.0 + z * z / n
+    centre = (p + z * z / (2.0 * n)) / denominator
+    half = z * math.sqrt(p * (1.0 - p) / n + z * z / (4.0 * n * n)) / denominator
+    return Interval(p, max(0.0, centre - half), min(1.0, centre + half))
+
+
+def intervals(outcomes: Iterable[Hashable], confidence: float = CONFIDENCE) -> Dict[Hashable, Interval]:
+    """
+    Frequency interval of every outcome seen, e.g. dominant paths as tuples.
+    """
+    counts: Dict[Hashable, int] = {}
+    n = 0
+    for o in outcomes:
+        counts[o] = counts.get(o, 0) + 1
+        n += 1
+    return {o: wilson_interval(k, n, confidence) for o, k in counts.items()}
+
+
+def converged(outcome_intervals: Dict[Hashable, Interval], width: float) -> bool:
+    """
+    :return: whether every interval is at most `width` wide
+    """
+    return bool(outcome_intervals) and all(i.width <= width for i in outcome_intervals.values())
+
+
+def widest(outcome_intervals: Dict[Hashable, Interval]) -> Tuple[Hashable, Interval]:
+    return max(outcome_intervals.items(), key=lambda x: x[1].width)
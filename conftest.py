@@ -0,0 +1,41 @@
+import pytest
+
+from simulation_generator import Generator
+
+
+def make_landscape(genes: str = 'abc', size: int = 200, mutation_rate: float = 0.05, **kwargs):
+    """
+    Simulation of the genes mutating one way to their upper case, small enough to
+    reach its population maximum, where births are paired with deaths, within a run.
+
+    :param kwargs: options of the simulation, like `engine` and `seed`
+    """
+    return Generator(**kwargs).parameters(tuple(genes), [tuple(genes.upper())], default_rate=(2.0, 1.0), size=size,
+                                          default_mutation_rate=mutation_rate)
+
+
+def outcome(sim, path: bool = False, history: bool = False) -> tuple:
+    """
+    Everything a finished run is compared by in tests.
+
+    :param path: whether to include the names of the dominant path
+    :param history: whether to include the recorded times and sizes of every type
+    """
+    types = sim.get_types()
+    result = (sim.get_events(), sim.get_stop_time(), sim.get_stop_reason(), [t.size for t in types],
+              [t.max_size for t in types])
+    if path:
+        result += ([t.name for t in sim.get_dominant_path()],)
+    if history:
+        result += ([list(sim.get_times(t)) for t in types], [list(sim.get_sizes(t)) for t in types])
+    return result
+
+
+@pytest.fixture(name='landscape')
+def landscape_fixture():
+    return make_landscape
+
+
+@pytest.fixture(name='outcome')
+def outcome_fixture():
+    return outcome
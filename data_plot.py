@@ -1,10 +1,12 @@
 import itertools
 from collections import defaultdict
-from typing import List, Tuple, Set, Dict
+from typing import List, Tuple, Set, Dict, Union
 
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
 
+from history_file import HistoryFile
 from simulation import Simulation
 from type import Type
 
@@ -18,30 +20,46 @@ dominant_edge_arrow_colour = 'white'
 dominant_edge_bar_colour = 'red'
 
 
-def line_plot(sim: Simulation, plt=plt, do_reduce=True, title='Plot of type size over time'):
+def line_plot(sim: Union[Simulation, HistoryFile, str], plt=plt, do_reduce=True, title='Plot of type size over time',
+              start=0.0, end=None):
+    if not isinstance(sim, Simulation):
+        return __line_plot_file(sim, plt, do_reduce, title, start, end)
     reduce = __plot_setup(sim, plt, do_reduce)
     plt.title(title)
 
     legend_list = []
     for e in sim.get_types():
-        v, t = list(zip(*sim.get_history(e)[::reduce]))
-        plt.plot(t, v)
+        plt.plot(sim.get_times(e)[::reduce], sim.get_sizes(e)[::reduce])
         legend_list.append('{}'.format(e.full_name))
     plt.legend(legend_list, loc='upper left')
 
 
-def stacked_plot(sim: Simulation, plt=plt, do_reduce=True, title='Plot of type size over time'):
-    reduce = __plot_setup(sim, plt, do_reduce)
+def stacked_plot(sim: Union[Simulation, HistoryFile, str], plt=plt, do_reduce=True,
+                 title='Plot of type size over time', start=0.0, end=None):
+    if not isinstance(sim, Simulation):
+        return __stacked_plot_file(sim, plt, do_reduce, title, start, end)
+    __plot_setup(sim, plt, do_reduce)
     plt.title(title)
 
-    times = sim.get_times(sim.wildtype)[::reduce]
-    histories = [sim.get_sizes(t)[::reduce] for t in sim.get_types()]
+    times, histories = __shared_history(sim)
+    reduce = max(1, int(len(times) / resolution)) if do_reduce else 1
     labels = list(map(str, sim.get_types()))
 
-    plt.stackplot(times, histories, labels=labels)
+    plt.stackplot(times[::reduce], [h[::reduce] for h in histories], labels=labels)
     plt.legend(loc='lower right')
 
 
+def __shared_history(sim: Simulation) -> Tuple[np.ndarray, List[np.ndarray]]:
+    # Histories with a time axis per type, e.g. the 'change' policy, are stepped onto the union of their times
+    times = [np.asarray(sim.get_times(t)) for t in sim.get_types()]
+    sizes = [np.asarray(sim.get_sizes(t)) for t in sim.get_types()]
+    if all(len(t) == len(times[0]) and np.array_equal(t, times[0]) for t in times):
+        return times[0], sizes
+    shared = np.unique(np.concatenate(times))
+    # Each type keeps its last recorded size until its next record
+    return shared, [s[np.maximum(np.searchsorted(t, shared, side='right') - 1, 0)] for t, s in zip(times, sizes)]
+
+
 def __plot_setup(sim: Simulation, plt=plt, do_reduce=True):
     if not sim.check_history():
         raise Exception('This simulation has no history')
@@ -50,10 +68,45 @@ def __plot_setup(sim: Simulation, plt=plt, do_reduce=True):
     plt.ylabel("Number of type")
     plt.ylim((0, 1.1 * sim.get_pop_max()))
     plt.xlim((0, sim.get_tmax()))
-    num_points = len(sim.get_history(sim.get_types()[0]))
+    num_points = len(sim.get_times(sim.get_types()[0]))
     return max(1, int(num_points / resolution)) if do_reduce else 1
 
 
+def __line_plot_file(history: Union[HistoryFile, str], plt=plt, do_reduce=True, title='Plot of type size over time',
+                     start=0.0, end=None):
+    # Plot from a history file, only reading the records between start and end
+    history, times, sizes, reduce = __file_plot_setup(history, plt, do_reduce, start, end)
+    plt.title(title)
+
+    plt.plot(times[::reduce], sizes[::reduce])
+    plt.legend(history.header.get('full_names', history.names), loc='upper left')
+
+
+def __stacked_plot_file(history: Union[HistoryFile, str], plt=plt, do_reduce=True,
+                        title='Plot of type size over time', start=0.0, end=None):
+    history, times, sizes, reduce = __file_plot_setup(history, plt, do_reduce, start, end)
+    plt.title(title)
+
+    plt.stackplot(times[::reduce], sizes[::reduce].T, labels=history.names)
+    plt.legend(loc='lower right')
+
+
+def __file_plot_setup(history: Union[HistoryFile, str], plt=plt, do_reduce=True, start=0.0, end=None):
+    if not isinstance(history, HistoryFile):
+        history = HistoryFile(history)
+    times, sizes = history.window(start, end)
+    if len(times) == 0:
+        raise Exception('This history has no records between {} and {}'.format(start, end))
+
+    plt.xlabel("time")
+    plt.ylabel("Number of type")
+    if 'pop_max' in history.header:
+        plt.ylim((0, 1.1 * history.header['pop_max']))
+    plt.xlim((times[0], times[-1]))
+    reduce = max(1, int(len(times) / resolution)) if do_reduce else 1
+    return history, times, sizes, reduce
+
+
 def network(sim: Simulation, nx=nx, plt=plt) -> nx.Graph:
     return network_with_percentages(sim, [], base_arrows=True, percentages=False, nx=nx, plt=plt)
 
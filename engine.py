@@ -0,0 +1,124 @@
+import math
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from history import History
+from landscape import Landscape
+from observers import Schedule
+from rng import RandomStream
+from stop_conditions import StopCondition
+
+# Number of events between full re-summations of the running propensity totals
+RESUM_INTERVAL = 100000
+
+
+class Engine:
+    """
+    Base of the engines that run a `Landscape`.
+
+    An engine holds the state of one run, its time, number of events, the
+    size and largest size of each type and its random stream, and moves it
+    on with `advance`. Subclasses keep `sizes` and `max_sizes` indexed like
+    the landscape, in whatever sequence suits them.
+    """
+
+    def __init__(self, landscape: Landscape, pop_max: int, history: Optional[History] = None,
+                 rng: RandomStream = None):
+        """
+        :param landscape: compiled types to simulate
+        :param pop_max: population size at which births are paired with a death
+        :param history: optional history to record to as the run goes
+        :param rng: random stream to draw from, a new unseeded one if not given
+        """
+        self.landscape: Landscape = landscape
+        self.pop_max: int = pop_max
+        self.history: Optional[History] = history
+        self.rng: RandomStream = rng or RandomStream()
+
+        self.time: float = 0.0
+        self.events: int = 0
+        self.sizes: Sequence[int] = None
+        self.max_sizes: Sequence[int] = None
+
+    def advance(self, until: float, max_events: int = None) -> int:
+        """
+        Run events until time passes `until` or `max_events` events have happened.
+
+        :return: number of events run
+        """
+        raise NotImplementedError
+
+    def getstate(self) -> Dict:
+        """
+        Everything needed to continue the run exactly, except the random stream
+        which is saved separately, see `setstate`.
+        """
+        return {'time': self.time, 'events': self.events, 'sizes': self.sizes.tolist(),
+                'max_sizes': self.max_sizes.tolist()}
+
+    def setstate(self, state: Dict) -> None:
+        # Subclasses restore the sizes in their own form
+        self.time = state['time']
+        self.events = state['events']
+
+    def dominant_path(self) -> List[int]:
+        return self.landscape.dominant_path(self.sizes, self.max_sizes)
+
+    def sync(self) -> None:
+        """
+        Copy sizes back to the `Type` objects of the landscape.
+        """
+        for t, s, m in zip(self.landscape.types, self.sizes.tolist(), self.max_sizes.tolist()):
+            t.size = s
+            t.max_size = m
+
+
+def next_multiple(time: float, interval: float) -> float:
+    """
+    :return: the first multiple of `interval` after `time`
+    """
+    # A multiple reached exactly can divide to just under its count, so step past it
+    k = math.floor(time / interval) + 1
+    while k * interval <= time:
+        k += 1
+    return k * interval
+
+
+def run_until(advance: Callable[[float, Optional[int]], None], state: Callable[[], Tuple[float, int, Sequence[int]]],
+              t: float, stop: List[StopCondition], check_every: int, schedule: Schedule,
+              interval: float = None, checked: bool = False, after: Callable[[], None] = None) -> str:
+    """
+    Advance a run till its time passes `t` or one of the stop conditions is met,
+    stopping for the observers of `schedule` on the way. Stop conditions are
+    checked every `check_every` events, counted from the start of the
+    simulation, so a restored run checks at the same events.
+
+    :param advance: `Engine.advance` of the run
+    :param state: time, number of events and sizes of the run
+    :param interval: also stop at every multiple of this much simulated time
+    :param checked: stop every `check_every` events even without stop conditions
+    :param after: called every time the run stops, before the stop conditions are checked
+    :return: why the run ended
+    """
+    time, events, sizes = state()
+    schedule.notify(sizes, time, events, start=True)
+    while True:
+        if time >= t:
+            reason = 'time'
+            break
+
+        until = schedule.until(t)
+        if interval:
+            until = min(until, next_multiple(time, interval))
+        max_events = check_every - events % check_every if stop or checked else None
+        advance(until, schedule.max_events(events, max_events))
+
+        time, events, sizes = state()
+        schedule.notify(sizes, time, events)
+        if after is not None:
+            after()
+        reasons = [c.reason for c in stop if c.check(sizes, time)]
+        if reasons:
+            reason = reasons[0]
+            break
+    schedule.finish(sizes, time, events)
+    return reason
@@ -0,0 +1,150 @@
+from typing import List
+
+import numpy as np
+
+from landscape import Landscape
+from rng import RandomStream, Seed
+from stop_conditions import StopCondition
+from type import Type
+
+# Replicates from which an ensemble is faster than running them one after another
+MIN_REPLICATES = 100
+
+
+class Ensemble:
+    """
+    Runs many replicates of the same landscape together.
+
+    Sizes are held as a (replicates x types) array and every replicate that
+    hasn't reached the end time runs one event per step, with all random
+    draws for the step made in one batch. Event rules are the same as the
+    direct method in `Simulation`.
+
+    Every step costs a batch of NumPy calls whatever the number of replicates,
+    so an ensemble is only faster than running its replicates one after another
+    from about `MIN_REPLICATES` replicates, and several times slower with a
+    handful. Replicates draw from one shared stream, so a replicate can only be
+    repeated by running the whole ensemble again with the same seed and size.
+    """
+
+    def __init__(self, landscape: Landscape, pop_max: int, replicates: int, seed: Seed = None):
+        """
+        :param landscape: compiled types to simulate
+        :param pop_max: population size at which births are paired with a death
+        :param replicates: number of independent replicates
+        :param seed: seed of the stream all replicates draw from together, see `RandomStream`
+        """
+        self.landscape: Landscape = landscape
+        self.pop_max: int = pop_max
+        self.replicates: int = replicates
+
+        self.times: np.ndarray = np.zeros(replicates)
+        self.events: int = 0
+        # Replicates ended early, with why
+        self.stopped: np.ndarray = np.zeros(replicates, dtype=bool)
+        self.stop_reasons: List[str] = [None] * replicates
+        self.sizes: np.ndarray = np.tile(landscape.initial_sizes, (replicates, 1))
+        self.max_sizes: np.ndarray = self.sizes.copy()
+
+        self.rng: RandomStream = RandomStream(seed)
+        self.__rng: np.random.Generator = self.rng.generator
+
+        self.__mutation_counts: np.ndarray = np.diff(landscape.mutation_ptr)
+
+    def run(self, t: float, stop: List[StopCondition] = None, check_every: int = 1000) -> None:
+        """
+        Runs every replicate till its simulation time passes the given time,
+        or till one of the stop conditions is met for that replicate.
+
+        :param t: when to run the simulation till
+        :param stop: conditions to end a replicate early
+        :param check_every: number of steps between checks of the stop conditions
+        """
+        stop = stop or []
+        for condition in stop:
+            condition.prepare(self.landscape)
+        steps = 0
+        while True:
+            active = np.flatnonzero((self.times < t) & ~self.stopped)
+            if len(active) == 0:
+                break
+            self.__step(active)
+            steps += 1
+            if stop and steps % check_every == 0:
+                for r in active.tolist():
+                    reasons = [c.reason for c in stop if c.check(self.sizes[r], self.times[r])]
+                    if reasons:
+                        self.stopped[r] = True
+                        self.stop_reasons[r] = reasons[0]
+        self.stop_reasons = [r if r else 'time' for r in self.stop_reasons]
+
+    def __step(self, rows: np.ndarray) -> None:
+        # Work on the sizes in place while every replicate is still running
+        everything = len(rows) == self.replicates
+        n = self.sizes if everything else self.sizes[rows]
+        a_birth = n * self.landscape.birth
+        a_death = n * self.landscape.death
+        birth_total = a_birth.sum(axis=1)
+        death_total = a_death.sum(axis=1)
+        total = birth_total + death_total
+
+        # Replicates where every type has died out are finished
+        alive = total > 0
+        if not alive.all():
+            for r in rows[~alive].tolist():
+                self.stopped[r] = True
+                self.stop_reasons[r] = 'extinct'
+            everything = False
+            rows, n, a_birth, a_death = rows[alive], n[alive], a_birth[alive], a_death[alive]
+            birth_total, death_total, total = birth_total[alive], death_total[alive], total[alive]
+
+        self.times[rows] += self.__rng.exponential(1.0 / total)
+        r = self.__rng.random(len(rows)) * total
+        birth = r < birth_total
+
+        # Deaths
+        d_rows = np.flatnonzero(~birth)
+        d = self.__choose(a_death[d_rows], r[d_rows] - birth_total[d_rows])
+        n[d_rows, d] -= 1
+
+        # Births, which are paired with a death when over the population maximum
+        b_rows = np.flatnonzero(birth)
+        t = self.__choose(a_birth[b_rows], r[b_rows])
+        capped = n[b_rows].sum(axis=1) >= self.pop_max
+        cap_death = self.__choose(a_death[b_rows], self.__rng.random(len(b_rows)) * death_total[b_rows])
+        m = self.__mutate(t)
+        # Only update with death if types are different, otherwise they cancel
+        paired = capped & (cap_death != t) & (death_total[b_rows] > 0)
+        n[b_rows[paired], cap_death[paired]] -= 1
+        # A type already updated this event cannot be born into
+        born = ~capped | (paired & (m != cap_death))
+        n[b_rows[born], m[born]] += 1
+
+        if everything:
+            np.maximum(self.max_sizes, n, out=self.max_sizes)
+        else:
+            self.sizes[rows] = n
+            self.max_sizes[rows] = np.maximum(self.max_sizes[rows], n)
+        self.events += len(rows)
+
+    @staticmethod
+    def __choose(propensities: np.ndarray, r: np.ndarray) -> np.ndarray:
+        # First column of each row whose cumulative propensity is greater than r
+        return (np.cumsum(propensities, axis=1) > r[:, None]).argmax(axis=1)
+
+    def __mutate(self, t: np.ndarray) -> np.ndarray:
+        # Alias samples of every row at once, O(1) each whatever the number of targets
+        x = self.__rng.random(len(t)) * self.__mutation_counts[t]
+        k = x.astype(np.int64)
+        j = self.landscape.mutation_ptr[t] + k
+        j = np.where(x - k < self.landscape.mutation_alias_probability[j], j, self.landscape.mutation_alias[j])
+        return self.landscape.mutation_index[j]
+
+    def dominant_paths(self) -> List[List[int]]:
+        return [self.landscape.dominant_path(s, m) for s, m in zip(self.sizes.tolist(), self.max_sizes.tolist())]
+
+    def get_dominant_paths(self) -> List[List[Type]]:
+        """
+        Dominant path of every replicate, with the same meaning as `Simulation.get_dominant_path`.
+        """
+        return [self.landscape.to_types(p) for p in self.dominant_paths()]
@@ -0,0 +1,182 @@
+from array import array
+from typing import List, Sequence, Tuple, Optional
+
+# Changes made by one event, pairs of type index and change in size.
+# None means any type may have changed, for engines that don't track single events
+Changes = Optional[Sequence[Tuple[int, int]]]
+
+
+class History:
+    """
+    Records the size of every type over time in typed arrays.
+
+    Subclasses decide when a record is made. Engines call `start` once with the
+    initial sizes, then `record` after every event.
+    """
+
+    def __init__(self, types: int):
+        """
+        :param types: number of types being recorded
+        """
+        self.types: int = types
+
+    def start(self, time: float, sizes: Sequence[int]) -> None:
+        raise NotImplementedError
+
+    def record(self, time: float, sizes: Sequence[int], changes: Changes) -> None:
+        raise NotImplementedError
+
+    def times(self, i: int) -> Sequence[float]:
+        raise NotImplementedError
+
+    def sizes(self, i: int) -> Sequence[int]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self.times(0))
+
+
+class EventHistory(History):
+    """
+    Records every type after every event, as one shared array of times and a
+    flat (records x types) array of sizes.
+    """
+
+    def __init__(self, types: int):
+        super().__init__(types)
+        self._times = array('d')
+        self._sizes = array('i')
+
+    def start(self, time: float, sizes: Sequence[int]) -> None:
+        self._append(time, sizes)
+
+    def record(self, time: float, sizes: Sequence[int], changes: Changes) -> None:
+        self._append(time, sizes)
+
+    def _append(self, time: float, sizes: Sequence[int]) -> None:
+        self._times.append(time)
+        self._sizes.extend(sizes)
+
+    def times(self, i: int) -> Sequence[float]:
+        return self._times
+
+    def sizes(self, i: int) -> Sequence[int]:
+        return self._sizes[i::self.types]
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+
+class BoundedHistory(EventHistory):
+    """
+    Records after every `stride` events and keeps at most `limit` records.
+    When full, every other record is dropped and the stride doubles, so the
+    whole run stays covered at an evenly decreasing resolution.
+    """
+
+    def __init__(self, types: int, limit: int = 10000):
+        if limit < 2:
+            raise ValueError('History limit must be at least 2')
+        super().__init__(types)
+        self.limit: int = limit
+        self.stride: int = 1
+        self.__skipped: int = 0
+
+    def record(self, time: float, sizes: Sequence[int], changes: Changes) -> None:
+        self.__skipped += 1
+        if self.__skipped < self.stride:
+            return
+        self.__skipped = 0
+        if len(self._times) >= self.limit:
+            self.__decimate()
+        self._append(time, sizes)
+
+    def __decimate(self) -> None:
+        rows = len(self._times)
+        self._times = self._times[::2]
+        sizes = array('i')
+        for r in range(0, rows, 2):
+            sizes.extend(self._sizes[r * self.types:(r + 1) * self.types])
+        self._sizes = sizes
+        self.stride *= 2
+
+
+class GridHistory(EventHistory):
+    """
+    Records every type at fixed intervals of simulation time, with the sizes
+    each type had at that time.
+    """
+
+    def __init__(self, types: int, interval: float = 0.01):
+        if interval <= 0:
+            raise ValueError('History interval must be positive')
+        super().__init__(types)
+        self.interval: float = interval
+        self.__next: int = 0
+
+    def start(self, time: float, sizes: Sequence[int]) -> None:
+        self.__next = int(time / self.interval)
+        self.record(time, sizes, None)
+
+    def record(self, time: float, sizes: Sequence[int], changes: Changes) -> None:
+        if self.__next * self.interval > time:
+            return
+        # Grid points passed by this event saw the sizes from before it
+        before = list(sizes)
+        for i, change in changes or ():
+            before[i] -= change
+        while self.__next * self.interval <= time:
+            self._append(self.__next * self.interval, before)
+            self.__next += 1
+
+
+class ChangeHistory(History):
+    """
+    Records a type only when its size changes, so each type has its own times.
+    """
+
+    def __init__(self, types: int):
+        super().__init__(types)
+        self.__times: List[array] = [array('d') for _ in range(types)]
+        self.__sizes: List[array] = [array('i') for _ in range(types)]
+        self.__last: List[int] = [0] * types
+
+    def start(self, time: float, sizes: Sequence[int]) -> None:
+        for i, s in enumerate(sizes):
+            self.__times[i].append(time)
+            self.__sizes[i].append(s)
+        self.__last = list(sizes)
+
+    def record(self, time: float, sizes: Sequence[int], changes: Changes) -> None:
+        indices = range(self.types) if changes is None else [i for i, _ in changes]
+        for i in indices:
+            s = sizes[i]
+            if s != self.__last[i]:
+                self.__last[i] = s
+                self.__times[i].append(time)
+                self.__sizes[i].append(s)
+
+    def times(self, i: int) -> Sequence[float]:
+        return self.__times[i]
+
+    def sizes(self, i: int) -> Sequence[int]:
+        return self.__sizes[i]
+
+
+POLICIES = {'event': EventHistory, 'change': ChangeHistory, 'grid': GridHistory, 'bounded': BoundedHistory}
+
+
+def make_history(policy: str, types: int, interval: float = None, limit: int = None) -> History:
+    """
+    :param policy: when to record, one of 'event', 'change', 'grid' or 'bounded'
+    :param types: number of types being recorded
+    :param interval: time between records for 'grid'
+    :param limit: largest number of records for 'bounded'
+    """
+    if policy == 'grid' and interval is not None:
+        return GridHistory(types, interval)
+    if policy == 'bounded' and limit is not None:
+        return BoundedHistory(types, limit)
+    if policy not in POLICIES:
+        raise ValueError('Unknown history policy \'{}\''.format(policy))
+    return POLICIES[policy](types)
@@ -0,0 +1,170 @@
+import json
+import os
+from typing import List, Sequence, Tuple, Dict
+
+import numpy as np
+
+from history import History, EventHistory, Changes
+
+# Records held in memory before being written out
+DEFAULT_CHUNK = 65536
+
+# Types of the 'd' and 'i' arrays used by `EventHistory`
+TIMES_DTYPE = np.float64
+SIZES_DTYPE = np.intc
+
+
+def _paths(path: str) -> Tuple[str, str, str]:
+    # Header, times column and sizes matrix
+    return path + '.json', path + '.times', path + '.sizes'
+
+
+class DiskHistory(History):
+    """
+    Streams the records of an `EventHistory` (or `GridHistory`) to disk.
+
+    Records are kept in memory until `chunk` have been made, then appended to a
+    times file and a (records x types) sizes file of raw values, which can be
+    opened with `HistoryFile` without loading them into memory.
+    """
+
+    def __init__(self, path: str, policy: EventHistory, names: List[str], chunk: int = DEFAULT_CHUNK,
+                 **metadata):
+        """
+        :param path: file path without extension, '.json', '.times' and '.sizes' are added
+        :param policy: history deciding when to record, its records are moved to disk
+        :param names: name of each type
+        :param chunk: number of records to buffer before writing
+        :param metadata: anything else to store in the header, e.g. pop_max
+        """
+        super().__init__(policy.types)
+        self.path: str = path
+        self.policy: EventHistory = policy
+        self.chunk: int = chunk
+        self.__header: Dict = dict(metadata, names=names, types=policy.types, records=0,
+                                   times_dtype=np.dtype(TIMES_DTYPE).str, sizes_dtype=np.dtype(SIZES_DTYPE).str)
+        self.__reader: HistoryFile = None
+        # Files are only started on the first write, so making a history to restore into leaves them alone
+        self.__created: bool = False
+
+    def __create(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _, times, sizes = _paths(self.path)
+        # Start empty files
+        open(times, 'wb').close()
+        open(sizes, 'wb').close()
+        self.__write_header()
+        self.__created = True
+
+    def start(self, time: float, sizes: Sequence[int]) -> None:
+        self.policy.start(time, sizes)
+        if len(self.policy._times) >= self.chunk:
+            self.flush()
+
+    def record(self, time: float, sizes: Sequence[int], changes: Changes) -> None:
+        self.policy.record(time, sizes, changes)
+        if len(self.policy._times) >= self.chunk:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write buffered records to disk.
+        """
+        if not self.__created:
+            self.__create()
+        records = len(self.policy._times)
+        if records == 0:
+            return
+        _, times, sizes = _paths(self.path)
+        with open(times, 'ab') as f:
+            f.write(self.policy._times.tobytes())
+        with open(sizes, 'ab') as f:
+            f.write(self.policy._sizes.tobytes())
+        del self.policy._times[:]
+        del self.policy._sizes[:]
+        self.__header['records'] += records
+        self.__write_header()
+        self.__reader = None
+
+    def __write_header(self) -> None:
+        with open(_paths(self.path)[0], 'w') as f:
+            json.dump(self.__header, f)
+
+    def __getstate__(self) -> Dict:
+        # Pickled as the records written so far, for checkpoints
+        self.flush()
+        state = self.__dict__.copy()
+        state['_DiskHistory__reader'] = None
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        # Drop anything written after the state was saved
+        self.__dict__.update(state)
+        records = self.__header['records']
+        _, times, sizes = _paths(self.path)
+        with open(times, 'ab') as f:
+            f.truncate(records * np.dtype(TIMES_DTYPE).itemsize)
+        with open(sizes, 'ab') as f:
+            f.truncate(records * self.types * np.dtype(SIZES_DTYPE).itemsize)
+        self.__write_header()
+
+    def reader(self) -> 'HistoryFile':
+        self.flush()
+        if self.__reader is None:
+            self.__reader = HistoryFile(self.path)
+        return self.__reader
+
+    def times(self, i: int) -> Sequence[float]:
+        return self.reader().times
+
+    def sizes(self, i: int) -> Sequence[int]:
+        return self.reader().sizes[:, i]
+
+    def __len__(self) -> int:
+        return self.__header['records'] + len(self.policy._times)
+
+
+class HistoryFile:
+    """
+    Read only view of a history written by `DiskHistory`.
+
+    Times and sizes are memory mapped, so slicing a window of time only reads
+    that part of the file.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: file path without extension, as given to `DiskHistory`
+        """
+        if path.endswith('.json'):
+            path = path[:-5]
+        header, times, sizes = _paths(path)
+        with open(header, 'r') as f:
+            self.header: Dict = json.load(f)
+
+        self.names: List[str] = self.header['names']
+        records, types = self.header['records'], self.header['types']
+        if records == 0:
+            self.times: np.ndarray = np.zeros(0, dtype=self.header['times_dtype'])
+            self.sizes: np.ndarray = np.zeros((0, types), dtype=self.header['sizes_dtype'])
+        else:
+            self.times = np.memmap(times, dtype=self.header['times_dtype'], mode='r', shape=(records,))
+            self.sizes = np.memmap(sizes, dtype=self.header['sizes_dtype'], mode='r', shape=(records, types))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def window(self, start: float = 0.0, end: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Records with times in [start, end].
+
+        :return: times and (records x types) sizes within the window
+        """
+        lo = int(np.searchsorted(self.times, start, side='left'))
+        hi = len(self.times) if end is None else int(np.searchsorted(self.times, end, side='right'))
+        return self.times[lo:hi], self.sizes[lo:hi]
+
+    def get_sizes(self, name: str) -> np.ndarray:
+        return self.sizes[:, self.names.index(name)]
@@ -0,0 +1,424 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from engine import Engine, RESUM_INTERVAL
+from history import History
+from landscape import Landscape
+from rng import RandomStream
+from sum_tree import SumTree
+
+# Default size at which a type is simulated as continuous
+THRESHOLD = 100
+# How far below the population maximum a total with continuous types is still held at it, so a total
+# rounded to just under the maximum doesn't take a step of its own to get back
+HOLD = 1.0
+
+
+class _Rates(NamedTuple):
+    # Total propensities of continuous and stochastic events under one rule for births, and the
+    # mean and variance of the change of each continuous type per unit time
+    continuous: float
+    stochastic: float
+    drift: np.ndarray
+    variance: np.ndarray
+
+
+class _Flux(NamedTuple):
+    # Propensities of the continuous types at the start of a step: births with a continuous child by
+    # child, deaths, births with a continuous child by parent, births of the parent's own type,
+    # births by parent, and the totals of births, births with a continuous child and deaths
+    inflow: np.ndarray
+    death: np.ndarray
+    into: np.ndarray
+    own: np.ndarray
+    birth: np.ndarray
+    births: float
+    into_total: float
+    deaths: float
+
+
+class HybridEngine(Engine):
+    """
+    Approximate engine mixing continuous and stochastic types.
+
+    Types of at least `threshold` are continuous, the rest stochastic. Events
+    among continuous types only, a birth of a continuous type into a continuous
+    type, paired at `pop_max` with the death of a continuous type, or the death
+    of a continuous type, are integrated together as a chemical Langevin
+    equation, or as an ODE without the noise. Any event a stochastic type takes
+    part in, including a continuous type's birth mutating into a stochastic
+    type, is run exactly, one at a time, when the integral of those events'
+    propensity along the continuous path reaches an exponential draw.
+
+    A type becomes continuous when it reaches `threshold`, and stochastic again
+    below half of it, its size rounded at random to a whole number. With no
+    continuous types this is the direct method. The noise of each continuous
+    type is drawn independently of the others, which ignores their correlation
+    when several are continuous at once, but while the population is held at
+    `pop_max` it is drawn so it doesn't change the total. The population is
+    held within one individual of `pop_max` by mixing paired and unpaired
+    births, where the direct method dips a few individuals below it.
+
+    Stochastic types are kept in propensity trees changed only by their own
+    events, as in `ArrayEngine`, and each step works on the continuous types
+    alone, with the mutation flows between them compiled whenever a type
+    changes regime.
+    """
+
+    def __init__(self, landscape: Landscape, pop_max: int, history: Optional[History] = None,
+                 threshold: float = THRESHOLD, mode: str = 'cle', epsilon: float = 0.03, rng: RandomStream = None):
+        """
+        :param landscape: compiled types to simulate
+        :param pop_max: population size at which births are paired with a death
+        :param history: optional history to record to after every step
+        :param threshold: size at which a type becomes continuous
+        :param mode: 'cle' for the chemical Langevin equation, 'ode' for deterministic continuous types
+        :param epsilon: error control, largest expected relative change of a continuous type in one step
+        :param rng: random stream to draw from, a new unseeded one if not given
+        """
+        if mode not in ('cle', 'ode'):
+            raise ValueError('Unknown hybrid mode \'{}\''.format(mode))
+        super().__init__(landscape, pop_max, history, rng)
+        self.threshold: float = threshold
+        self.mode: str = mode
+        self.epsilon: float = epsilon
+
+        # Whole sizes of stochastic types, continuous ones are only written here by `__write`
+        self.sizes: np.ndarray = landscape.initial_sizes.copy()
+        self.max_sizes: np.ndarray = self.sizes.copy()
+
+        self.__birth_rates: List[float] = landscape.birth.tolist()
+        self.__death_rates: List[float] = landscape.death.tolist()
+        self.__sample_mutation = landscape.sample_mutation
+        # Mutation probabilities normalised to sum to one per source
+        sources = np.repeat(np.arange(len(landscape)), np.diff(landscape.mutation_ptr))
+        self.__probability: np.ndarray = landscape.mutation_probability / landscape.mutation_total[sources]
+
+        # Propensities of stochastic types, zero for continuous ones
+        self.__birth: SumTree = SumTree([0.0] * len(landscape))
+        self.__death: SumTree = SumTree([0.0] * len(landscape))
+        # Number of individuals of stochastic types
+        self.__size: int = 0
+        # Exact events run since the trees were last re-summed
+        self.__exact: int = 0
+
+        # Sizes and largest sizes of continuous types, which are real, in the order of `__index`
+        self.__x: np.ndarray = np.zeros(0)
+        self.__max_x: np.ndarray = np.zeros(0)
+        self.__index: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.__regime(self.sizes >= threshold)
+
+        # Integrated stochastic propensity left till the next stochastic event
+        self.__clock: float = self.rng.standard_exponential()
+        # Fraction of an event integrated but not yet counted
+        self.__carry: float = 0.0
+
+    def advance(self, until: float, max_events: int = None) -> int:
+        """
+        Run steps until time passes `until` or at least `max_events` events have happened.
+
+        :return: number of events run
+        """
+        start = self.events
+        while self.time < until and (max_events is None or self.events - start < max_events):
+            if not self.__step(until):
+                # Nothing can happen any more
+                self.time = until
+            if self.history is not None:
+                self.__write()
+                self.history.record(self.time, self.sizes.tolist(), None)
+        self.__write()
+        return self.events - start
+
+    def __step(self, until: float) -> bool:
+        x = self.__x
+        stochastic = self.__birth.total + self.__death.total
+        dt = until - self.time
+        n = self.__size + x.sum()
+        # Share of the step's stochastic propensity with births paired, when held at the maximum
+        paired_share = None
+        if not len(x):
+            # Every event is exact, so births are paired exactly as in the direct method
+            flux = None
+            at_max = n >= self.pop_max
+            rates = _Rates(0.0, stochastic, x, x)
+        else:
+            flux = self.__flux()
+            grow = flux.into_total - flux.deaths
+            free = self.__rates(flux, stochastic, False) if n < self.pop_max + 1 else None
+            paired = self.__rates(flux, stochastic, True) if n >= self.pop_max - HOLD else None
+            shrink = paired.drift.sum() if paired else 0.0
+            if n >= self.pop_max + 1:
+                at_max, rates = True, paired
+                if shrink < 0:
+                    dt = min(dt, (n - self.pop_max) / -shrink)
+            elif n >= self.pop_max - HOLD and grow > 0:
+                # Held at the population maximum, the share of time births are paired keeps the total constant,
+                # as the direct method moving between the maximum and one below it does
+                share = grow / (grow - shrink)
+                rates = _Rates(*(share * p + (1.0 - share) * f for p, f in zip(paired, free)))
+                paired_share = share * paired.stochastic / rates.stochastic if rates.stochastic > 0 else 0.0
+            else:
+                at_max, rates = False, free
+                # Stop at the population maximum instead of passing it
+                if grow > 0:
+                    dt = min(dt, (self.pop_max - n) / grow)
+
+        a_continuous, a_stochastic, drift, variance = rates
+        if a_continuous == 0 and a_stochastic == 0:
+            return False
+
+        if flux is not None:
+            bound = np.maximum(self.epsilon * x, 1.0)
+            # Fastest relative change of a continuous type, by its mean or by its spread
+            limit = float((np.maximum(np.abs(drift) * bound, variance) / (bound * bound)).max())
+            if limit > 0:
+                dt = min(dt, 1.0 / limit)
+        fire = a_stochastic > 0 and self.__clock <= a_stochastic * dt
+        if fire:
+            dt = self.__clock / a_stochastic
+
+        if flux is not None:
+            if self.mode == 'cle':
+                noise = np.sqrt(variance * dt) * self.rng.generator.standard_normal(len(x))
+                if paired_share is not None:
+                    # Held at the maximum, births are paired with deaths as often as needed to keep the total,
+                    # so the noise is drawn given the total doesn't change
+                    noise -= variance * (noise.sum() / variance.sum())
+                x += drift * dt + noise
+            else:
+                x += drift * dt
+            np.maximum(x, 0.0, out=x)
+            np.maximum(self.__max_x, x, out=self.__max_x)
+        self.__carry += a_continuous * dt
+        self.events += int(self.__carry)
+        self.__carry -= int(self.__carry)
+        self.__clock -= a_stochastic * dt
+        self.time += dt
+
+        if fire:
+            if paired_share is not None:
+                # Chosen by the propensities at the start of the step, as the clock was run down with them
+                at_max = self.rng.random() < paired_share
+            self.__stochastic(flux, at_max)
+            self.__clock = self.rng.standard_exponential()
+        if len(self.__x) and self.__x.min() < self.threshold / 2:
+            self.__fall()
+        return True
+
+    def __flux(self) -> _Flux:
+        c = len(self.__x)
+        v = self.__linear @ self.__x
+        return _Flux(v[:c], v[c:2 * c], v[2 * c:3 * c], v[3 * c:4 * c], v[4 * c:5 * c], float(v[-3]), float(v[-2]),
+                     float(v[-1]))
+
+    def __rates(self, flux: _Flux, stochastic: float, at_max: bool) -> _Rates:
+        inflow, death, into, own, _, births, into_total, deaths = flux
+        if not at_max:
+            w_continuous = 1.0
+            paired = 0.0
+        else:
+            # Chance the death paired with a birth is of each continuous type, and of any of them
+            total = deaths + self.__death.total
+            if total > 0:
+                w = death / total
+                w_continuous = deaths / total
+                # A birth is only kept when its paired death is of neither the parent nor the child,
+                # summed over parents with the deaths of parents taken out by the quadratic operator
+                inflow = (w_continuous - w) * inflow - self.__quadratic @ (self.__x * self.__x) / total + w * own
+                paired = w * (into_total - into)
+            else:
+                w_continuous = 0.0
+                inflow = paired = np.zeros_like(inflow)
+        a_continuous = w_continuous * into_total + deaths
+        a_stochastic = max(stochastic + births - w_continuous * into_total, 0.0)
+        # Mean and variance of the change of each continuous type per unit time
+        return _Rates(a_continuous, a_stochastic, inflow - paired - death, inflow + paired + death)
+
+    def __stochastic(self, flux: Optional[_Flux], at_max: bool) -> None:
+        # Run one event any stochastic type takes part in
+        rng = self.rng
+        birth, death = self.__birth, self.__death
+        if flux is None:
+            deaths = total = 0.0
+        else:
+            deaths = flux.deaths
+            all_deaths = deaths + death.total
+            w_continuous = deaths / all_deaths if at_max and all_deaths > 0 else float(not at_max)
+            # Births of continuous types with a stochastic child or paired death
+            total = max(flux.births - w_continuous * flux.into_total, 0.0)
+
+        u = rng.random() * (death.total + birth.total + total)
+        if u < death.total:
+            d = death.find(u)
+            if d < len(death):
+                self.__add(d, -1)
+            self.__count()
+            return
+        u -= death.total
+        if u < birth.total:
+            t = birth.find(u)
+            if t == len(birth):
+                self.__count()
+                return
+            m = self.__sample_mutation(t, rng.random())
+            d = self.__paired_death(deaths, flux) if at_max else None
+        elif flux is None:
+            # Past the totals by rounding
+            self.__count()
+            return
+        else:
+            k = self.__choose(flux.birth - w_continuous * flux.into, u - birth.total)
+            t = int(self.__index[k])
+            p_continuous = self.__into_continuous[k]
+            # Either the child is stochastic, or it's continuous and the paired death is stochastic
+            if not at_max or rng.random() * (1.0 - w_continuous * p_continuous) < 1.0 - p_continuous:
+                m = self.__mutate(t, False)
+                d = self.__paired_death(deaths, flux) if at_max else None
+            else:
+                m = self.__mutate(t, True)
+                d = death.find(rng.random() * death.total)
+
+        if not at_max:
+            self.__add(m, 1)
+        # Only update with death if types are different, otherwise they cancel
+        elif d is not None and d != t and d < len(death):
+            self.__add(d, -1)
+            # A type already updated this event cannot be born into
+            if m != d:
+                self.__add(m, 1)
+        self.__count()
+
+    def __count(self) -> None:
+        self.events += 1
+        self.__exact += 1
+        if self.__exact % RESUM_INTERVAL == 0 or self.__size == 0:
+            self.__birth.rebuild()
+            self.__death.rebuild()
+
+    def __paired_death(self, deaths: float, flux: Optional[_Flux]) -> int:
+        # Type of the death paired with a birth at the population maximum, of any regime
+        death = self.__death
+        u = self.rng.random() * (deaths + death.total)
+        if u < death.total or flux is None:
+            return death.find(u)
+        return int(self.__index[self.__choose(flux.death, u - death.total)])
+
+    def __add(self, i: int, change: int) -> None:
+        k = self.__position[i]
+        if k >= 0:
+            self.__x[k] += change
+            return
+        s = int(self.sizes[i]) + change
+        self.sizes[i] = s
+        if s > self.max_sizes[i]:
+            self.max_sizes[i] = s
+        self.__size += change
+        self.__birth.set(i, self.__birth_rates[i] * s)
+        self.__death.set(i, self.__death_rates[i] * s)
+        if s >= self.threshold:
+            continuous = self.__position >= 0
+            continuous[i] = True
+            self.__regime(continuous, *self.__real())
+
+    def __fall(self) -> None:
+        # Types falling below half the threshold become stochastic again, with a gap so types at the
+        # threshold don't switch back and forth, their sizes rounded at random
+        x, index = self.__x, self.__index
+        falling = x < self.threshold / 2
+        whole = np.floor(x[falling])
+        sizes, max_sizes = self.__real()
+        sizes[index[falling]] = whole + (np.array([self.rng.random() for _ in whole]) < x[falling] - whole)
+        self.sizes[index[falling]] = sizes[index[falling]]
+        continuous = self.__position >= 0
+        continuous[index[falling]] = False
+        self.__regime(continuous, sizes, max_sizes)
+
+    def __real(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Sizes and largest sizes of every type, real for continuous types
+        self.__write()
+        sizes, max_sizes = self.sizes.astype(np.float64), self.max_sizes.astype(np.float64)
+        sizes[self.__index] = self.__x
+        max_sizes[self.__index] = self.__max_x
+        return sizes, max_sizes
+
+    def __regime(self, continuous: np.ndarray, sizes: np.ndarray = None, max_sizes: np.ndarray = None) -> None:
+        """
+        Compile the continuous types and the mutation flows between them, and
+        move every type's propensities to the trees of its regime.
+
+        :param continuous: which types are continuous from now on
+        :param sizes: sizes of every type, real for types continuous so far, `sizes` if not given
+        :param max_sizes: largest sizes of every type, `max_sizes` if not given
+        """
+        landscape = self.landscape
+        index = np.flatnonzero(continuous)
+        self.__index = index
+        self.__position = np.full(len(landscape), -1, dtype=np.int64)
+        self.__position[index] = np.arange(len(index))
+        if sizes is None:
+            sizes, max_sizes = self.sizes.astype(np.float64), self.max_sizes.astype(np.float64)
+        self.__x = sizes[index]
+        self.__max_x = max_sizes[index]
+
+        # Chance a birth of each continuous type is of each other, and of any continuous type
+        flow = np.zeros((len(index), len(index)))
+        for k, t in enumerate(index):
+            lo, hi = landscape.mutation_ptr[t], landscape.mutation_ptr[t + 1]
+            targets = self.__position[landscape.mutation_index[lo:hi]]
+            np.add.at(flow[k], targets[targets >= 0], self.__probability[lo:hi][targets >= 0])
+        self.__into_continuous = flow.sum(axis=1)
+        # Every propensity of a step is linear in the continuous sizes, in the order of `_Flux`, but
+        # for the births whose paired death is of their parent, which go with the parent's size squared
+        birth, death = landscape.birth[index], landscape.death[index]
+        into = birth * self.__into_continuous
+        self.__linear = np.vstack([(flow * birth[:, None]).T, np.diag(death), np.diag(into),
+                                   np.diag(birth * np.diag(flow)), np.diag(birth), birth, into, death])
+        self.__quadratic = (flow * (birth * death)[:, None]).T
+
+        whole = np.where(continuous, 0, self.sizes)
+        self.__size = int(whole.sum())
+        self.__birth = SumTree((landscape.birth * whole).tolist())
+        self.__death = SumTree((landscape.death * whole).tolist())
+
+    def __write(self) -> None:
+        # Bring the whole sizes of continuous types up to date
+        self.sizes[self.__index] = np.rint(self.__x)
+        self.max_sizes[self.__index] = np.rint(self.__max_x)
+
+    def __choose(self, weights: np.ndarray, u: float) -> int:
+        # Index of the weight `u` falls in, counted from the start of the first
+        k = int(np.searchsorted(np.cumsum(weights), u, side='right'))
+        return min(k, len(weights) - 1)
+
+    def __mutate(self, t: int, continuous: bool) -> int:
+        # Type a birth of `t` mutates into, among continuous or stochastic types only
+        landscape = self.landscape
+        lo, hi = int(landscape.mutation_ptr[t]), int(landscape.mutation_ptr[t + 1])
+        targets = landscape.mutation_index[lo:hi]
+        p = self.__probability[lo:hi] * ((self.__position[targets] >= 0) == continuous)
+        return int(targets[self.__choose(p, self.rng.random() * p.sum())])
+
+    def getstate(self) -> Dict:
+        """
+        Sizes, regimes, time, the stochastic clock and the propensity trees as
+        they are, the random stream is saved separately.
+        """
+        self.__write()
+        return dict(super().getstate(), x=self.__x.tolist(), max_x=self.__max_x.tolist(),
+                    continuous=(self.__position >= 0).tolist(), birth=self.__birth, death=self.__death,
+                    exact=self.__exact, clock=self.__clock, carry=self.__carry)
+
+    def setstate(self, state: Dict) -> None:
+        super().setstate(state)
+        self.sizes = np.array(state['sizes'], dtype=self.landscape.initial_sizes.dtype)
+        self.max_sizes = np.array(state['max_sizes'], dtype=self.landscape.initial_sizes.dtype)
+        self.__regime(np.array(state['continuous'], dtype=bool))
+        self.__x = np.array(state['x'], dtype=np.float64)
+        self.__max_x = np.array(state['max_x'], dtype=np.float64)
+        self.__birth = state['birth']
+        self.__death = state['death']
+        self.__exact = state['exact']
+        self.__clock = state['clock']
+        self.__carry = state['carry']
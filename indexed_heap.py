@@ -0,0 +1,75 @@
+from typing import List, Sequence, Tuple
+
+
+class IndexedHeap:
+    """
+    Binary min-heap of a fixed set of indices keyed by float values.
+
+    Knows where each index sits in the heap, so the key of any index can be
+    changed in O(log n) and the smallest key is read in O(1).
+    """
+
+    def __init__(self, keys: Sequence[float]):
+        self.__n: int = len(keys)
+        self.__keys: List[float] = list(keys)
+        self.__heap: List[int] = sorted(range(self.__n), key=self.__keys.__getitem__)
+        # Position of every index in the heap, a sorted list is already a heap
+        self.__pos: List[int] = [0] * self.__n
+        for p, i in enumerate(self.__heap):
+            self.__pos[i] = p
+
+    def top(self) -> Tuple[int, float]:
+        """
+        :return: the index with the smallest key and its key
+        """
+        i = self.__heap[0]
+        return i, self.__keys[i]
+
+    def set(self, i: int, key: float) -> None:
+        old = self.__keys[i]
+        self.__keys[i] = key
+        if key < old:
+            self.__up(self.__pos[i])
+        elif key > old:
+            self.__down(self.__pos[i])
+
+    def __up(self, p: int) -> None:
+        heap, pos, keys = self.__heap, self.__pos, self.__keys
+        i = heap[p]
+        key = keys[i]
+        while p > 0:
+            parent = (p - 1) >> 1
+            j = heap[parent]
+            if keys[j] <= key:
+                break
+            heap[p] = j
+            pos[j] = p
+            p = parent
+        heap[p] = i
+        pos[i] = p
+
+    def __down(self, p: int) -> None:
+        heap, pos, keys = self.__heap, self.__pos, self.__keys
+        n = self.__n
+        i = heap[p]
+        key = keys[i]
+        while True:
+            child = 2 * p + 1
+            if child >= n:
+                break
+            if child + 1 < n and keys[heap[child + 1]] < keys[heap[child]]:
+                child += 1
+            j = heap[child]
+            if key <= keys[j]:
+                break
+            heap[p] = j
+            pos[j] = p
+            p = child
+        heap[p] = i
+        pos[i] = p
+
+    def __getitem__(self, i: int) -> float:
+        return self.__keys[i]
+
+    def __len__(self) -> int:
+        return self.__n
@@ -0,0 +1,65 @@
+from typing import Dict, List, Sequence
+
+# Kinds of event counted, a mutation is also counted as the birth or paired event it happened in
+KINDS = ('birth', 'death', 'paired', 'cancelled', 'nothing', 'mutation')
+# Phases of an event timed: choosing the event and any paired death, choosing the mutation,
+# updating sizes and propensities, re-summing the propensities and recording history
+PHASES = ('select', 'mutate', 'update', 'resum', 'history')
+# Default number of events per timed event
+SAMPLE_INTERVAL = 100
+
+
+class Instrumentation:
+    """
+    Counts of every event by kind and by type, and the time spent in each phase
+    of one in every `sample_every` events.
+    """
+
+    def __init__(self, names: List[str], sample_every: int = SAMPLE_INTERVAL):
+        """
+        :param names: names of the types, in simulation order
+        :param sample_every: number of events per timed event
+        """
+        self.names: List[str] = names
+        self.sample_every: int = sample_every
+        self.kinds: Dict[str, int] = dict.fromkeys(KINDS, 0)
+        self.births: List[int] = [0] * len(names)
+        self.deaths: List[int] = [0] * len(names)
+        self.mutations: List[int] = [0] * len(names)
+        self.seconds: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.sampled: int = 0
+        # Events left till the next timed one, the first is timed
+        self.__countdown: int = 1
+
+    def timed(self) -> bool:
+        """
+        :return: whether the coming event should be timed
+        """
+        self.__countdown -= 1
+        if self.__countdown:
+            return False
+        self.__countdown = self.sample_every
+        self.sampled += 1
+        return True
+
+    def time(self, clock: Sequence[float]) -> None:
+        """
+        :param clock: times at the start of the event and at the end of each phase
+        """
+        for phase, start, end in zip(PHASES, clock, clock[1:]):
+            self.seconds[phase] += end - start
+
+    def report(self, events: int, wall: float) -> Dict:
+        """
+        :param events: number of events run
+        :param wall: wall time of the run in seconds
+        :return: counts by kind and by type, and the mean time and share of each phase of the timed events
+        """
+        total = sum(self.seconds.values())
+        phases = {p: {'seconds_per_event': s / self.sampled if self.sampled else None,
+                      'share': s / total if total else None} for p, s in self.seconds.items()}
+        types = {n: {'births': b, 'deaths': d, 'mutations': m}
+                 for n, b, d, m in zip(self.names, self.births, self.deaths, self.mutations)}
+        return {'events': events, 'wall_seconds': wall, 'events_per_second': events / wall if wall else None,
+                'kinds': dict(self.kinds), 'types': types, 'sampled': self.sampled,
+                'sample_every': self.sample_every, 'phases': phases}
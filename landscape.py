@@ -0,0 +1,195 @@
+from array import array
+from typing import List, Dict, Sequence, Tuple
+
+import numpy as np
+
+from alias import alias_table
+
+from type import Type, Event
+
+
+def _csr(rows: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    # Compressed sparse rows, row i is indices[ptr[i]:ptr[i + 1]]
+    ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(r) for r in rows])
+    indices = np.fromiter((j for r in rows for j in r), dtype=np.int64, count=int(ptr[-1]))
+    return ptr, indices
+
+
+class Landscape:
+    """
+    Array form of a graph of `Type`s.
+
+    Rates, initial sizes, mutation probabilities and the parent/child topology
+    are compiled into contiguous arrays indexed by the position of each type,
+    so engines can run without touching the `Type` objects. The arrays are read
+    only, one landscape is shared by every replicate run on it, which each only
+    hold their own sizes.
+    """
+
+    def __init__(self, types: List[Type], wildtype: Type, finals: List[Type] = None, arrays: Dict = None):
+        """
+        :param types: types to compile, must already have had `Type.sim_init` called
+        :param wildtype: type dominant paths are traced back to
+        :param finals: fully mutated types
+        :param arrays: arrays of these types already compiled, as given by `to_dict`
+        """
+        self.types: Tuple[Type, ...] = tuple(types)
+        self.index: Dict[Type, int] = {t: i for i, t in enumerate(self.types)}
+        self.wildtype: int = self.index[wildtype]
+        self.finals: List[int] = [self.index[t] for t in finals or []]
+
+        self.names: List[str] = [t.name for t in self.types]
+        self.positions: List[Tuple[float, float]] = [getattr(t, 'pos', None) for t in self.types]
+        if arrays is None:
+            arrays = self.__compile()
+        self.birth: np.ndarray = arrays['birth']
+        self.death: np.ndarray = arrays['death']
+        self.initial_sizes: np.ndarray = arrays['initial_sizes']
+
+        # Mutation table, row i holds the types a birth of type i can be and their probabilities
+        self.mutation_ptr: np.ndarray = arrays['mutation_ptr']
+        self.mutation_index: np.ndarray = arrays['mutation_index']
+        self.mutation_probability: np.ndarray = arrays['mutation_probability']
+        self.mutation_total: np.ndarray = np.array([t.mutation_total for t in self.types], dtype=np.float64)
+        # Alias table of each row, the aliases are positions in the whole mutation table
+        self.mutation_alias_probability, self.mutation_alias = self.__alias_tables()
+
+        self.parent_ptr: np.ndarray = arrays['parent_ptr']
+        self.parent_index: np.ndarray = arrays['parent_index']
+        self.child_ptr: np.ndarray = arrays['child_ptr']
+        self.child_index: np.ndarray = arrays['child_index']
+
+        for a in (self.birth, self.death, self.initial_sizes, self.mutation_ptr, self.mutation_index,
+                  self.mutation_probability, self.mutation_total,
+                  self.mutation_alias_probability, self.mutation_alias,
+                  self.parent_ptr, self.parent_index, self.child_ptr, self.child_index):
+            a.flags.writeable = False
+        self.__buffers: Dict[str, array] = None
+        self.__mutation_tables: Tuple[array, array, array, array] = None
+
+    def __alias_tables(self) -> Tuple[np.ndarray, np.ndarray]:
+        probability = np.ones(len(self.mutation_index), dtype=np.float64)
+        alias = np.arange(len(self.mutation_index), dtype=np.int64)
+        ptr = self.mutation_ptr.tolist()
+        weights = self.mutation_probability.tolist()
+        for i in range(len(self.types)):
+            lo, hi = ptr[i], ptr[i + 1]
+            if lo < hi:
+                p, a = alias_table(weights[lo:hi])
+                probability[lo:hi] = p
+                alias[lo:hi] = np.array(a, dtype=np.int64) + lo
+        return probability, alias
+
+    def __compile(self) -> Dict[str, np.ndarray]:
+        arrays = {'birth': np.array([t.rates[Event.BIRTH] for t in self.types], dtype=np.float64),
+                  'death': np.array([t.rates[Event.DEATH] for t in self.types], dtype=np.float64),
+                  'initial_sizes': np.array([t.initial_size for t in self.types], dtype=np.int64),
+                  'mutation_probability': np.array([p for t in self.types for _, p in t.mutations],
+                                                   dtype=np.float64)}
+        arrays['mutation_ptr'], arrays['mutation_index'] = _csr([[self.index[m] for m, _ in t.mutations]
+                                                                 for t in self.types])
+        arrays['parent_ptr'], arrays['parent_index'] = _csr([[self.index[p] for p in t.parents] for t in self.types])
+        arrays['child_ptr'], arrays['child_index'] = _csr([[self.index[c] for c in t.children] for t in self.types])
+        return arrays
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def to_dict(self) -> Dict:
+        """
+        Plain arrays and lists describing the landscape, without any `Type` objects.
+        """
+        return {'names': self.names, 'positions': self.positions, 'wildtype': self.wildtype, 'finals': self.finals,
+                'birth': self.birth, 'death': self.death, 'initial_sizes': self.initial_sizes,
+                'mutation_ptr': self.mutation_ptr, 'mutation_index': self.mutation_index,
+                'mutation_probability': self.mutation_probability,
+                'parent_ptr': self.parent_ptr, 'parent_index': self.parent_index,
+                'child_ptr': self.child_ptr, 'child_index': self.child_index}
+
+    @staticmethod
+    def from_dict(d: Dict) -> 'Landscape':
+        """
+        Rebuild the `Type` graph described by `to_dict` and compile it.
+        """
+        types = [Type(name, int(size), float(birth), float(death))
+                 for name, size, birth, death in zip(d['names'], d['initial_sizes'].tolist(), d['birth'].tolist(),
+                                             d['death'].tolist())]
+        mutation_ptr, mutation_index = d['mutation_ptr'].tolist(), d['mutation_index'].tolist()
+        mutation_probability = d['mutation_probability'].tolist()
+        parent_ptr, parent_index = d['parent_ptr'].tolist(), d['parent_index'].tolist()
+        child_ptr, child_index = d['child_ptr'].tolist(), d['child_index'].tolist()
+        for i, t in enumerate(types):
+            if d['positions'][i] is not None:
+                t.pos = tuple(d['positions'][i])
+            lo, hi = mutation_ptr[i], mutation_ptr[i + 1]
+            t.mutations = [(types[j], p) for j, p in zip(mutation_index[lo:hi], mutation_probability[lo:hi])]
+            t.set_mutation_total()
+            for j in parent_index[parent_ptr[i]:parent_ptr[i + 1]]:
+                t.add_parent(types[j])
+            for j in child_index[child_ptr[i]:child_ptr[i + 1]]:
+                t.add_child(types[j])
+        return Landscape(types, types[d['wildtype']], [types[i] for i in d['finals']], arrays=d)
+
+    def buffers(self) -> Dict[str, array]:
+        """
+        The rate and mutation tables as `array`s, which are quicker to index one
+        element at a time than NumPy arrays. Made once and shared by every engine
+        on this landscape, so must not be changed.
+        """
+        if self.__buffers is None:
+            self.__buffers = {'birth': array('d', self.birth.tolist()), 'death': array('d', self.death.tolist()),
+                              'mutation_ptr': array('q', self.mutation_ptr.tolist()),
+                              'mutation_index': array('q', self.mutation_index.tolist()),
+                              'mutation_alias_probability': array('d', self.mutation_alias_probability.tolist()),
+                              'mutation_alias': array('q', self.mutation_alias.tolist())}
+        return self.__buffers
+
+    def sample_mutation(self, t: int, u: float) -> int:
+        """
+        O(1) alias sample of the type a birth of type `t` mutates into, the same
+        one `Type.choose_mutation` makes.
+
+        :param t: index of the type giving birth
+        :param u: uniform draw in [0, 1)
+        :return: index of the type born
+        """
+        if self.__mutation_tables is None:
+            buffers = self.buffers()
+            self.__mutation_tables = (buffers['mutation_ptr'], buffers['mutation_index'],
+                                      buffers['mutation_alias_probability'], buffers['mutation_alias'])
+        ptr, index, probability, alias = self.__mutation_tables
+        lo = ptr[t]
+        x = u * (ptr[t + 1] - lo)
+        k = int(x)
+        j = lo + k
+        return index[j if x - k < probability[j] else alias[j]]
+
+    def parents(self, i: int) -> np.ndarray:
+        return self.parent_index[self.parent_ptr[i]:self.parent_ptr[i + 1]]
+
+    def children(self, i: int) -> np.ndarray:
+        return self.child_index[self.child_ptr[i]:self.child_ptr[i + 1]]
+
+    def dominant_path(self, sizes: Sequence[int], max_sizes: Sequence[int]) -> List[int]:
+        """
+        Index form of `Simulation.get_dominant_path`.
+
+        :param sizes: final size of each type
+        :param max_sizes: maximum size each type reached
+        :return: indices of the path from the largest type back to the wildtype
+        """
+        # Find largest type at end of simulation
+        i = max(range(len(self.types)), key=lambda x: sizes[x])
+        path = [i]
+        # Trace back to wildtype through largest parent or child
+        while i != self.wildtype:
+            poss = set(self.parents(i).tolist()) | set(self.children(i).tolist())
+            # Dominant path cannot go through the same node twice
+            poss -= set(path)
+            i = max(poss, key=lambda x: max_sizes[x])
+            path.append(i)
+        return path
+
+    def to_types(self, path: Sequence[int]) -> List[Type]:
+        return [self.types[i] for i in path]
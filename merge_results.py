@@ -0,0 +1,56 @@
+import argparse
+import os
+import re
+import sys
+from os.path import join
+from typing import Dict, List, Tuple
+
+import results
+
+parser = argparse.ArgumentParser('merge_results')
+parser.add_argument('files', nargs='+', help='shard result files written by multiple_simulations.py -k')
+parser.add_argument('-o', help='folder to write merged results to, defaults to the folder of the shards',
+                    type=str, default=None)
+args = parser.parse_args()
+
+SHARD_SUFFIX = re.compile(r'\.shard-\d+-of-\d+$')
+
+
+def merged_filename(shard_file: str, output_folder: str = None) -> str:
+    folder, name = os.path.split(os.path.splitext(shard_file)[0])
+    return join(output_folder if output_folder is not None else folder, SHARD_SUFFIX.sub('', name) + '.sim')
+
+
+def merge_files(files: List[str], output_folder: str = None) -> bool:
+    """
+    Merge shard files into one result file per config and run time.
+
+    :return: whether every config merged without duplicates or gaps
+    """
+    # Group shards of the same run
+    runs: Dict[Tuple[str, float], List[str]] = {}
+    for f in files:
+        _, _, metadata = results.load_results(f)
+        runs.setdefault((metadata.get('config_hash'), metadata.get('time')), []).append(f)
+
+    ok = True
+    for shard_files in runs.values():
+        filename = merged_filename(shard_files[0], output_folder)
+        try:
+            landscape, merged, metadata = results.merge_results([results.load_results(f) for f in shard_files])
+        except ValueError as e:
+            print('Couldn\'t merge {}: {}'.format(filename, e), file=sys.__stderr__)
+            ok = False
+            continue
+        results.save_results(filename, landscape, merged, **metadata)
+        print('Merged {} shards of {} replicates into {}'.format(len(shard_files), len(merged), filename))
+    return ok
+
+
+if __name__ == '__main__':
+    if args.o:
+        os.makedirs(args.o, exist_ok=True)
+    if not merge_files(args.files, args.o):
+        sys.exit(1)
+
+# python merge_results.py data/two_paths_ABC_D/*.shard-*.sim
@@ -1,50 +1,148 @@
 import argparse
-import functools
 import os
-import pickle
 import sys
 import time
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
 from os import listdir
 from os.path import isfile, join
-from typing import List
+from typing import List, Dict, Iterator, NamedTuple, Tuple
 
+import results
+from confidence import CONFIDENCE, Interval, intervals, converged, widest
+from ensemble import Ensemble, MIN_REPLICATES
+from result_store import ResultStore, RunKey
+from results import Result
+from rng import replicate_seed
+from scheduler import Scheduler
 from simulation import Simulation
-from simulation_generator import Generator
-from type import Type
+from simulation_generator import Generator, CACHE
+from stop_conditions import StopCondition, FinalDominance
+
+# Most replicates run per config with -w when -n isn't given, about enough for intervals 0.05 wide
+MAX_REPLICATES = 2000
 
 parser = argparse.ArgumentParser('multiple_simulations')
 parser.add_argument('-c', nargs='+', help='config file(s) for simulation in JSON format', default=None)
 parser.add_argument('-d', help='directory of config file(s) for simulation in JSON format', type=str, default=None)
-parser.add_argument('-n', help='number of simulations to run', type=int, default=1)
+parser.add_argument('-n', help='number of simulations to run, or the most to run with -w, defaults to 1 or to {} '
+                         'with -w'.format(MAX_REPLICATES), type=int, default=None)
 parser.add_argument('-t', help='time input for Simulation.run()', type=float, default=0.0)
 parser.add_argument('-v', help='verbose mode, prints a lot more but will get messy', type=bool, default=False)
+parser.add_argument('-f', help='stop a simulation early once a fully mutated type is this fraction of the population',
+                    type=float, default=None)
+parser.add_argument('-s', help='base random seed, each replicate has its own stream from it', type=int, default=None)
+parser.add_argument('-r', help='result store, finished replicates are kept here and skipped when run again, '
+                         'defaults to data/results.db or one store per shard', type=str, default=None)
+parser.add_argument('-e', help='run replicates together with the ensemble engine, only faster with at least '
+                         '{} replicates per config, and replicates can\'t be repeated on their own'.format(MIN_REPLICATES),
+                    action='store_true')
+parser.add_argument('-k', help='only run shard i of N of the replicates, given as i/N with i from 0, '
+                         'combine the shards with merge_results.py', type=str, default=None)
+parser.add_argument('-w', help='run replicates in batches until the {:.0f}%% confidence interval of every dominant path '
+                         'frequency is at most this wide'.format(CONFIDENCE * 100), type=float, default=None)
+parser.add_argument('-b', help='replicates per batch with -w', type=int, default=50)
 args = parser.parse_args()
 
 CONFIG_FILES: List[str] = args.c
 DIRECTORY: str = args.d
-SIM_NUM: int = args.n
+SIM_NUM: int = args.n if args.n is not None else (1 if args.w is None else MAX_REPLICATES)
 TIME: float = args.t
 PRINT: bool = args.v
+ENSEMBLE: bool = args.e
+FRACTION: float = args.f
+BASE_SEED: int = args.s
+
+SHARD: Tuple[int, int] = None
+if args.k:
+    try:
+        SHARD = tuple(int(x) for x in args.k.split('/'))
+    except ValueError:
+        parser.error('Shard must be given as i/N')
+    if len(SHARD) != 2 or not 0 <= SHARD[0] < SHARD[1]:
+        parser.error('Shard must be given as i/N with 0 <= i < N')
+WIDTH: float = args.w
+BATCH: int = args.b
+if WIDTH is not None and SHARD is not None:
+    parser.error('Replicate counts chosen by -w can\'t be sharded')
+STORE: str = args.r or ('data/results.db' if SHARD is None else 'data/results.shard-{}-of-{}.db'.format(*SHARD))
 
 CONFIG = 'config/'
 DATA = 'data/'
 
 
-def dominant_path(sim: Simulation, name: str) -> List[Type]:
-    sim = sim.clone()
-    # print('Running {}'.format(name))
-    sim.run(TIME)
+def stop_conditions() -> List[StopCondition]:
+    return [FinalDominance(FRACTION)] if FRACTION else []
+
+
+def config_seed(config_hash: str) -> int:
+    # Without a seed given, derive one from the config so re-running the same command repeats the same replicates
+    return BASE_SEED if BASE_SEED is not None else int(config_hash[:8], 16)
+
+
+def run_key(config_hash: str) -> RunKey:
+    return RunKey(config_hash, TIME, config_seed(config_hash), FRACTION or 0.0, 'ensemble' if ENSEMBLE else 'direct')
+
+
+def shard_replicates(replicates: int, shard: Tuple[int, int] = None) -> range:
+    """
+    Replicate numbers run by a shard, the shards of N split the replicates into N contiguous blocks.
+
+    :param replicates: total number of replicates
+    :param shard: shard i of N, all replicates if None
+    """
+    if shard is None:
+        return range(replicates)
+    i, n = shard
+    return range(i * replicates // n, (i + 1) * replicates // n)
+
+
+def dominant_path(sim: Simulation, base_seed: int, replicate: int) -> Result:
+    # Runs on the landscape shared by every replicate of the config instead of a copy of its types
+    run = sim.replicate(seed=replicate_seed(base_seed, replicate))
+    # print('Running {}'.format(replicate))
+    run.run(TIME, stop=stop_conditions())
+    if PRINT:
+        print('Finished {} at {} ({})'.format(replicate, run.stop_time, run.stop_reason))
+    # Traced by index, so ties between types are broken the same way in every process
+    return Result(run.dominant_path(), base_seed, run.stop_time, run.stop_reason, replicate)
+
+
+def dominant_paths(sim: Simulation, base_seed: int, replicates: List[int]) -> List[Result]:
+    return [dominant_path(sim, base_seed, i) for i in replicates]
+
+
+def ensemble_dominant_paths(sim: Simulation, base_seed: int, replicates: List[int]) -> List[Result]:
+    # Replicates of an ensemble share the stream of its first replicate, so none has a seed of its own
+    ensemble = Ensemble(sim.get_landscape(), sim.get_pop_max(), len(replicates),
+                        seed=replicate_seed(base_seed, replicates[0]))
+    ensemble.run(TIME, stop=stop_conditions())
     if PRINT:
-        print('Finished {}'.format(name))
-    return sim.get_dominant_path()
+        print('Finished {} replicates'.format(len(replicates)))
+    return [Result(p, None, t, r, i) for p, t, r, i in zip(ensemble.dominant_paths(), ensemble.times.tolist(),
+                                                                ensemble.stop_reasons, replicates)]
+
 
+class ConfigRun(NamedTuple):
+    """
+    One config of a sweep and the replicates it still needs.
+    """
+    config: str
+    config_hash: str
+    simulation: Simulation
+    base_seed: int
+    filename: str
+    todo: List[int]
+    # Stored replicates of other keys aren't reused
+    key: RunKey
 
-def run_multiple_simulations(config: str, output_folder: str):
-    g = Generator(prints=PRINT)
+
+def prepare_run(store: ResultStore, config: str, output_folder: str) -> ConfigRun:
+    # Sweeps build the same configs in every job, so their landscapes are cached
+    g = Generator(cache=CACHE, prints=PRINT)
     if PRINT:
         print(config)
     s = g.config_file(config)
+    config_hash = Generator.config_hash(Generator.read_config(config))
 
     # Showing graphs messes with threading, only use to test simulation config
     # data_plot.network(s, nx)
@@ -59,26 +157,136 @@ def run_multiple_simulations(config: str, output_folder: str):
     # data_plot.line_plot(s_dup, plt)
     # plt.show()
 
-    print('Simulating {} {} times for {} time'.format(config, SIM_NUM, TIME))
-    print('Starting at {}'.format(time.strftime("%Y-%m-%d %H:%M:%S")))
-    t0 = time.time()
+    store.add_landscape(config_hash, s.get_landscape(), config)
+    key = run_key(config_hash)
+    # Only run replicates that haven't already been stored for the same seed, stop condition and engine
+    done = store.done(key)
+    replicates = shard_replicates(SIM_NUM, SHARD)
+    todo = [i for i in replicates if i not in done]
+    print('Simulating {} {} times for {} time ({} already done)'.format(config, len(replicates), TIME,
+                                                                       len(replicates) - len(todo)))
+
+    filename = os.path.basename(os.path.splitext(config)[0])
+    if SHARD is not None:
+        filename += '.shard-{}-of-{}'.format(*SHARD)
+    filename = join(output_folder, '{}.sim'.format(filename))
+    return ConfigRun(config, config_hash, s, key.seed, filename, todo, key)
 
-    with Pool(maxtasksperchild=1) as pool:
-        simulations = [config + '_{}'.format(i) for i in range(SIM_NUM)]
 
-        f = functools.partial(dominant_path, s)
+def finish_run(store: ResultStore, run: ConfigRun, replicates: int = SIM_NUM,
+               path_intervals: Dict[Tuple[int, ...], Interval] = None) -> None:
+    key = run.key
+    shard = shard_replicates(replicates, SHARD)
+    result = [r for r in store.results(key, shard.stop) if r.replicate in shard]
+    # Metadata is taken from the key the rows were stored under, and must agree with every row
+    stray = [r.replicate for r in result if not key.fraction and r.stop_reason == FinalDominance.reason]
+    if stray:
+        raise ValueError('Replicates {} of {} weren\'t run as {}'.format(stray, run.config, key))
+    metadata = dict(config=run.config, config_hash=key.config_hash, seed=key.seed, time=key.time,
+                    fraction=key.fraction or None, ensemble=key.engine == 'ensemble', replicates=replicates,
+                    shard=SHARD)
+    if path_intervals is not None:
+        metadata.update(intervals={path: tuple(i) for path, i in path_intervals.items()}, confidence=CONFIDENCE,
+                        width=WIDTH)
+    results.save_results(run.filename, run.simulation.get_landscape(), result, **metadata)
+    print('Finished {} with {} replicates at {}'.format(run.config, replicates, time.strftime("%Y-%m-%d %H:%M:%S")))
 
-        result = pool.map(f, simulations)
 
-    print('Finished simulations at {}'.format(time.strftime("%Y-%m-%d %H:%M:%S")))
-    print('Took {}s'.format(time.time() - t0))
+def schedule(store: ResultStore, scheduled: List[ConfigRun], todo: Dict[str, List[int]]) -> Iterator[str]:
+    """
+    Runs replicates of every config from one queue shared by all CPUs, storing
+    each as it finishes.
 
-    filename = os.path.basename(os.path.splitext(config)[0])
+    :param todo: replicates to run by config hash
+    :return: iterator of config hashes, each given once all its replicates are done
+    """
+    remaining = {h: len(replicates) for h, replicates in todo.items()}
+    for h in [h for h, n in remaining.items() if n == 0]:
+        yield h
+    scheduled = [run for run in scheduled if todo[run.config_hash]]
+    if not scheduled:
+        return
 
-    filename = join(output_folder, '{}.sim'.format(filename))
+    # Workers are sent the template simulations once and kept for every replicate
+    scheduler = Scheduler({run.config_hash: (run.simulation, run.base_seed) for run in scheduled})
+    if ENSEMBLE:
+        # Split the replicates of each config between one ensemble per CPU, as long as each is big enough to pay off
+        work = []
+        for run in scheduled:
+            replicates = todo[run.config_hash]
+            processes = max(1, min(cpu_count(), len(replicates) // MIN_REPLICATES))
+            work += [(run.config_hash, replicates[i::processes]) for i in range(processes)]
+        chunk = max(len(items) for _, items in work)
+        finished = scheduler.run(ensemble_dominant_paths, work, min_chunk=chunk, max_chunk=chunk)
+    else:
+        finished = scheduler.run(dominant_paths, [(run.config_hash, todo[run.config_hash]) for run in scheduled])
+    keys = {run.config_hash: run.key for run in scheduled}
+    for config_hash, chunk_results in finished:
+        for r in chunk_results:
+            store.add(keys[config_hash], r)
+        remaining[config_hash] -= len(chunk_results)
+        if remaining[config_hash] == 0:
+            yield config_hash
+
+
+def run_multiple_simulations(configs: List[Tuple[str, str]]):
+    """
+    Runs every config of a sweep from one queue of replicates shared by all
+    CPUs, so configs overlap instead of each leaving CPUs idle as it finishes.
+    Each config's results are saved as soon as all its replicates are done.
+
+    With a target width, replicates are run in batches until the confidence
+    interval of every dominant path's frequency is at most that wide, or the
+    maximum number of replicates is reached.
+
+    :param configs: pairs of config file and the folder to save its results in
+    """
+    with ResultStore(STORE) as store:
+        runs = [prepare_run(store, config, output_folder) for config, output_folder in configs]
+        # Configs with the same contents share their replicates
+        runs_by_hash: Dict[str, List[ConfigRun]] = {}
+        for run in runs:
+            runs_by_hash.setdefault(run.config_hash, []).append(run)
+        scheduled = [same[0] for same in runs_by_hash.values()]
+
+        print('Starting {} replicates of {} configs at {}'.format(
+            sum(len(run.todo) for run in scheduled) if WIDTH is None else 'up to {}'.format(SIM_NUM * len(scheduled)),
+            len(runs), time.strftime("%Y-%m-%d %H:%M:%S")))
+        t0 = time.time()
+
+        if WIDTH is None:
+            for config_hash in schedule(store, scheduled, {run.config_hash: run.todo for run in scheduled}):
+                for run in runs_by_hash[config_hash]:
+                    finish_run(store, run)
+        else:
+            # Replicate numbers always start from 0, so a stopping point is repeatable
+            counts = {run.config_hash: 0 for run in scheduled}
+            while scheduled:
+                todo = {}
+                for run in scheduled:
+                    counts[run.config_hash] = min(SIM_NUM, counts[run.config_hash] + BATCH)
+                    done = store.done(run.key)
+                    todo[run.config_hash] = [i for i in range(counts[run.config_hash]) if i not in done]
+                for config_hash in schedule(store, scheduled, todo):
+                    n = counts[config_hash]
+                    key = runs_by_hash[config_hash][0].key
+                    path_intervals = intervals((tuple(r.path) for r in store.results(key, n)), CONFIDENCE)
+                    if not converged(path_intervals, WIDTH):
+                        if n < SIM_NUM:
+                            if PRINT:
+                                print('{} after {} replicates, widest interval {:.3f}'.format(
+                                    runs_by_hash[config_hash][0].config, n, widest(path_intervals)[1].width))
+                            continue
+                        print('Warning: {} stopped at the most replicates, {}, with its widest interval {:.3f} '
+                              'instead of at most {}'.format(runs_by_hash[config_hash][0].config, n,
+                                                             widest(path_intervals)[1].width, WIDTH),
+                              file=sys.__stderr__)
+                    for run in runs_by_hash[config_hash]:
+                        finish_run(store, run, n, path_intervals)
+                    scheduled = [run for run in scheduled if run.config_hash != config_hash]
 
-    with open(filename, 'wb') as f_sim:
-        pickle.dump(result, f_sim, -1)
+        print('Finished simulations at {}'.format(time.strftime("%Y-%m-%d %H:%M:%S")))
+        print('Took {}s'.format(time.time() - t0))
 
 
 if __name__ == '__main__':
@@ -93,10 +301,12 @@ if __name__ == '__main__':
     os.makedirs(DATA, exist_ok=True)
 
     if CONFIG_FILES:
+        sweep = []
         for c in CONFIG_FILES:
             data_dir = os.path.dirname(join(DATA, c))
             os.makedirs(data_dir, exist_ok=True)
-            run_multiple_simulations(join(CONFIG, c), data_dir)
+            sweep.append((join(CONFIG, c), data_dir))
+        run_multiple_simulations(sweep)
     elif DIRECTORY:
         config_directory = join(CONFIG, DIRECTORY)
         data_directory = join(DATA, DIRECTORY)
@@ -104,9 +314,7 @@ if __name__ == '__main__':
         os.makedirs(data_directory, exist_ok=True)
         # Find all config files in config directory
         files = [f for f in listdir(config_directory) if isfile(join(config_directory, f)) and '.json' in f]
-        for c in files:
-            run_multiple_simulations(join(config_directory, c), data_directory)
-            print('------------------')
+        run_multiple_simulations([(join(config_directory, c), data_directory) for c in sorted(files)])
     else:
         print('No config files or folder specified, exiting')
 
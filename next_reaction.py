@@ -0,0 +1,145 @@
+import math
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from engine import Engine, RESUM_INTERVAL
+from history import History
+from indexed_heap import IndexedHeap
+from landscape import Landscape
+from rng import RandomStream
+from sum_tree import SumTree
+
+
+class NextReactionEngine(Engine):
+    """
+    Gibson and Bruck's next reaction method, an exact engine.
+
+    Every type has a birth and a death channel, channel `2 * i` and `2 * i + 1`,
+    each with the absolute time it next fires, kept in an `IndexedHeap`. The
+    earliest channel fires. Only the channels of types whose size changed are
+    rescheduled. Channels that didn't fire rescale their waiting time to their
+    new propensity instead of drawing a new one. A birth changes its mutation
+    target, plus the paired death when at `pop_max`, so those follow
+    `Type.mutations` as the dependency graph. Runs the same event rules as
+    `Simulation`, so results agree with it in distribution but not draw for draw.
+    """
+
+    def __init__(self, landscape: Landscape, pop_max: int, history: Optional[History] = None,
+                 rng: RandomStream = None):
+        """
+        :param landscape: compiled types to simulate
+        :param pop_max: population size at which births are paired with a death
+        :param history: optional history to record to after every event
+        :param rng: random stream to draw from, a new unseeded one if not given
+        """
+        super().__init__(landscape, pop_max, history, rng)
+        self.__changes: List[Tuple[int, int]] = []
+
+        self.sizes: array = array('i', landscape.initial_sizes.tolist())
+        self.max_sizes: array = array('i', self.sizes)
+        self.size: int = sum(self.sizes)
+
+        # Shared with every other engine on the landscape, only read
+        buffers = landscape.buffers()
+        self.__rates: List[float] = [r for b, d in zip(buffers['birth'], buffers['death']) for r in (b, d)]
+        self.__death_rates: array = buffers['death']
+        self.__sample_mutation = landscape.sample_mutation
+
+        # Deaths paired with a birth at pop_max are chosen by death propensity
+        self.__death = SumTree([r * s for r, s in zip(self.__death_rates, self.sizes)])
+
+        self.__propensities: List[float] = [self.__rates[c] * self.sizes[c >> 1] for c in range(2 * len(landscape))]
+        self.__heap = IndexedHeap([self.__draw(0.0, a) for a in self.__propensities])
+
+    def advance(self, until: float, max_events: int = None) -> int:
+        """
+        Run events until time passes `until` or `max_events` events have happened.
+
+        :return: number of events run
+        """
+        n = 0
+        while self.time < until and (max_events is None or n < max_events):
+            c, t = self.__heap.top()
+            if t == math.inf:
+                # Nothing can happen any more
+                self.time = until
+                break
+            self.__fire(c, t)
+            n += 1
+        return n
+
+    def __fire(self, c: int, t: float) -> None:
+        self.time = t
+        i = c >> 1
+        if c & 1:
+            self.__apply(i, -1)
+        elif self.size >= self.pop_max:
+            death = self.__death
+            d = death.find(self.rng.random() * death.total)
+            # Only update with death if types are different, otherwise they cancel
+            if d != i and d < len(death):
+                self.__apply(d, -1)
+                m = self.__sample_mutation(i, self.rng.random())
+                # A type already updated this event cannot be born into
+                if m != d:
+                    self.__apply(m, 1)
+        else:
+            self.__apply(self.__sample_mutation(i, self.rng.random()), 1)
+
+        self.__reschedule(c, t)
+
+        self.events += 1
+        if self.events % RESUM_INTERVAL == 0:
+            self.__death.rebuild()
+
+        if self.history is not None:
+            self.history.record(self.time, self.sizes, self.__changes)
+        self.__changes = []
+
+    def __reschedule(self, fired: int, t: float) -> None:
+        heap, propensities, rates, sizes = self.__heap, self.__propensities, self.__rates, self.sizes
+        for i, _ in self.__changes:
+            for c in (2 * i, 2 * i + 1):
+                a = rates[c] * sizes[i]
+                old = propensities[c]
+                if c == fired or a == old:
+                    continue
+                propensities[c] = a
+                if old == 0.0 or a == 0.0:
+                    heap.set(c, self.__draw(t, a))
+                else:
+                    # The unused part of the channel's exponential, rescaled to its new propensity
+                    heap.set(c, t + old / a * (heap[c] - t))
+        # The fired channel's exponential is used up
+        a = rates[fired] * sizes[fired >> 1]
+        propensities[fired] = a
+        heap.set(fired, self.__draw(t, a))
+
+    def __draw(self, t: float, a: float) -> float:
+        return t + self.rng.standard_exponential() / a if a > 0.0 else math.inf
+
+    def __apply(self, i: int, change: int) -> None:
+        s = self.sizes[i] + change
+        self.sizes[i] = s
+        if s > self.max_sizes[i]:
+            self.max_sizes[i] = s
+        self.size += change
+        self.__changes.append((i, change))
+        self.__death.set(i, self.__death_rates[i] * s)
+
+    def getstate(self) -> Dict:
+        """
+        Sizes, time, the firing times and the death tree as they are, so a
+        restored engine continues exactly, the random stream is saved separately.
+        """
+        return dict(super().getstate(), propensities=self.__propensities, heap=self.__heap, death=self.__death)
+
+    def setstate(self, state: Dict) -> None:
+        super().setstate(state)
+        self.sizes = array('i', state['sizes'])
+        self.max_sizes = array('i', state['max_sizes'])
+        self.size = sum(self.sizes)
+        self.__propensities = list(state['propensities'])
+        self.__heap = state['heap']
+        self.__death = state['death']
+        self.__changes = []
@@ -0,0 +1,203 @@
+import math
+from collections.abc import Sequence as SequenceABC
+from time import time as wall_time
+from typing import Callable, List, Optional, Sequence
+
+from landscape import Landscape
+
+
+class SizesView(SequenceABC):
+    """
+    Read-only view of the sizes of a running simulation, indexed like its
+    landscape. Only valid during the call it's given to, copy it to keep it.
+    """
+    __slots__ = ('__sizes',)
+
+    def __init__(self, sizes: Sequence[int]):
+        self.__sizes = sizes
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.__sizes[j] for j in range(*i.indices(len(self.__sizes)))]
+        return int(self.__sizes[i])
+
+    def __len__(self) -> int:
+        return len(self.__sizes)
+
+
+def _passed(time: float, point: float) -> bool:
+    # An engine stopped at a point can land a rounding error short of it
+    return time >= point or math.isclose(time, point)
+
+
+class Observer:
+    """
+    Watches a run every `interval` of simulated time and/or every `events` events.
+
+    The run stops its engine at those points instead of checking anything per
+    event, so an observer costs nothing between them. Times are counted from
+    `origin` and events from the start of the simulation, so a restored run
+    observes at the same points. Observations happen at the first event at or
+    after each point, or the first step past it for engines that take many
+    events at once, and once at the start of every run.
+    """
+
+    def __init__(self, interval: float = None, events: int = None):
+        """
+        :param interval: simulated time between observations
+        :param events: number of events between observations
+        """
+        if interval is not None and interval <= 0:
+            raise ValueError('Interval must be positive')
+        if events is not None and events <= 0:
+            raise ValueError('Events must be positive')
+        self.interval: Optional[float] = interval
+        self.events: Optional[int] = events
+        self.origin: float = 0.0
+        self.next_time: float = math.inf
+        self.next_event: float = math.inf
+        # Number of the next point of the time grid, so points don't drift with rounding
+        self.__point: int = 0
+
+    def prepare(self, landscape: Landscape, start: float, end: float) -> None:
+        """
+        Called once before a run with the landscape being simulated and the
+        times the run starts and ends at.
+        """
+        pass
+
+    def observe(self, sizes: SizesView, time: float, events: int) -> None:
+        raise NotImplementedError
+
+    def finish(self, sizes: SizesView, time: float, events: int) -> None:
+        """
+        Called once when a run ends.
+        """
+        pass
+
+    def reset(self, time: float, events: int) -> None:
+        """
+        Find the first points after the start of a run.
+        """
+        self.next_time = self.next_event = math.inf
+        if self.interval is not None:
+            self.__point = max(0, math.floor((time - self.origin) / self.interval))
+            while self.__point > 0 and not _passed(time, self.__grid(self.__point - 1)):
+                self.__point -= 1
+        self.advance(time, events)
+
+    def due(self, time: float, events: int) -> bool:
+        return _passed(time, self.next_time) or events >= self.next_event
+
+    def advance(self, time: float, events: int) -> None:
+        """
+        Move to the first points after the given time and number of events.
+        """
+        if self.interval is not None:
+            while _passed(time, self.__grid(self.__point)):
+                self.__point += 1
+            self.next_time = self.__grid(self.__point)
+        if self.events is not None:
+            self.next_event = (events // self.events + 1) * self.events
+
+    def __grid(self, point: int) -> float:
+        return self.origin + point * self.interval
+
+
+class Callback(Observer):
+    """
+    Calls `f(sizes, time, events)` at every observation.
+    """
+
+    def __init__(self, f: Callable[[SizesView, float, int], None], interval: float = None, events: int = None):
+        super().__init__(interval, events)
+        self.f = f
+
+    def observe(self, sizes: SizesView, time: float, events: int) -> None:
+        self.f(sizes, time, events)
+
+
+class GridSampler(Observer):
+    """
+    Keeps a copy of the sizes at every observation.
+    """
+
+    def __init__(self, interval: float = None, events: int = None):
+        super().__init__(interval, events)
+        self.times: List[float] = []
+        self.sizes: List[List[int]] = []
+
+    def observe(self, sizes: SizesView, time: float, events: int) -> None:
+        self.times.append(time)
+        self.sizes.append(list(sizes))
+
+
+class Progress(Observer):
+    """
+    Prints the share of the run done and the wall time taken at every
+    `fraction` of the run's simulated time.
+    """
+
+    def __init__(self, fraction: float = 0.1):
+        super().__init__()
+        self.fraction: float = fraction
+        self.__start: float = 0.0
+        self.__end: float = 0.0
+        self.__t0: float = 0.0
+
+    def prepare(self, landscape: Landscape, start: float, end: float) -> None:
+        self.__start, self.__end = start, end
+        self.__t0 = wall_time()
+        # Points are fractions of this run, not of all simulated time
+        self.origin = start
+        self.interval = (end - start) * self.fraction if end > start else None
+
+    def observe(self, sizes: SizesView, time: float, events: int) -> None:
+        done = min(time - self.__start, self.__end - self.__start) / (self.__end - self.__start) \
+            if self.__end > self.__start else 1.0
+        print("{}%\t{:f}s".format(int(round(done * 100)), wall_time() - self.__t0))
+
+
+class Schedule:
+    """
+    When a run next has to stop its engine for its observers.
+    """
+
+    def __init__(self, observers: List[Observer], landscape: Optional[Landscape], start: float, end: float,
+                 events: int):
+        """
+        :param landscape: landscape of the run, only None when no observer looks at it, like `Progress`
+        """
+        self.observers: List[Observer] = observers
+        for o in observers:
+            o.prepare(landscape, start, end)
+            o.reset(start, events)
+
+    def until(self, until: float) -> float:
+        return min([until] + [o.next_time for o in self.observers])
+
+    def max_events(self, events: int, max_events: Optional[int]) -> Optional[int]:
+        # Fewest events till the next observer counting events is due
+        limits = [o.next_event - events for o in self.observers if o.events]
+        if max_events is not None:
+            limits.append(max_events)
+        return min(limits) if limits else None
+
+    def notify(self, sizes: Sequence[int], time: float, events: int, start: bool = False) -> None:
+        """
+        Call every observer due at this time and event count, or all of them at the start of a run.
+        """
+        # Engines may keep time and counts as NumPy scalars
+        time, events = float(time), int(events)
+        view = None
+        for o in self.observers:
+            if start or o.due(time, events):
+                if view is None:
+                    view = SizesView(sizes)
+                o.observe(view, time, events)
+                o.advance(time, events)
+
+    def finish(self, sizes: Sequence[int], time: float, events: int) -> None:
+        view = SizesView(sizes)
+        for o in self.observers:
+            o.finish(view, float(time), int(events))
@@ -0,0 +1,96 @@
+from typing import List, Sequence
+
+from array_engine import ArrayEngine
+from engine import Engine, run_until
+from history import History
+from hybrid import HybridEngine, THRESHOLD
+from landscape import Landscape
+from next_reaction import NextReactionEngine
+from observers import Observer, Schedule
+from rng import RandomStream, Seed
+from stop_conditions import StopCondition, CHECK_INTERVAL
+from tau_leaping import TauLeapEngine
+
+# Names of the engines, 'direct' and 'array' run the same events
+ENGINES = ('direct', 'array', 'next_reaction', 'tau', 'hybrid')
+
+
+def make_engine(name: str, landscape: Landscape, pop_max: int, history: History = None, rng: RandomStream = None,
+                tau_epsilon: float = 0.03, tau_critical: int = 10, hybrid_threshold: float = THRESHOLD,
+                hybrid_mode: str = 'cle', hybrid_epsilon: float = 0.03) -> Engine:
+    """
+    :param name: one of `ENGINES`
+    :param landscape: compiled types to simulate
+    :param pop_max: population size at which births are paired with a death
+    :param history: optional history to record to
+    :param rng: random stream to draw from
+    :param tau_epsilon: see `TauLeapEngine`
+    :param tau_critical: see `TauLeapEngine`
+    :param hybrid_threshold: see `HybridEngine`
+    :param hybrid_mode: see `HybridEngine`
+    :param hybrid_epsilon: see `HybridEngine`
+    """
+    if name in ('direct', 'array'):
+        return ArrayEngine(landscape, pop_max, history, rng=rng)
+    if name == 'next_reaction':
+        return NextReactionEngine(landscape, pop_max, history, rng=rng)
+    if name == 'tau':
+        return TauLeapEngine(landscape, pop_max, history, rng=rng, epsilon=tau_epsilon, critical=tau_critical)
+    if name == 'hybrid':
+        return HybridEngine(landscape, pop_max, history, rng=rng, threshold=hybrid_threshold, mode=hybrid_mode,
+                            epsilon=hybrid_epsilon)
+    raise ValueError('Unknown engine \'{}\''.format(name))
+
+
+class Replicate:
+    """
+    One run of a shared `Landscape`.
+
+    Rates, mutation tables and topology are read from the landscape, a
+    replicate only holds the state of its run, sizes, maximum sizes, time and
+    its random stream, so making one costs O(number of types) and copies no
+    `Type`s. Runs the same events as `Simulation` given the same seed.
+    """
+
+    def __init__(self, landscape: Landscape, pop_max: int, engine: str = 'direct', seed: Seed = None, **options):
+        """
+        :param landscape: shared landscape to run on
+        :param pop_max: population size at which births are paired with a death
+        :param engine: one of `ENGINES`
+        :param seed: seed of the replicate's random stream, see `RandomStream`
+        :param options: engine options, see `make_engine`
+        """
+        self.landscape: Landscape = landscape
+        self.engine: Engine = make_engine(engine, landscape, pop_max, rng=RandomStream(seed), **options)
+        self.stop_reason: str = None
+        self.stop_time: float = None
+
+    def run(self, t: float, stop: List[StopCondition] = None, check_every: int = CHECK_INTERVAL,
+            observers: List[Observer] = None) -> None:
+        """
+        Runs till the simulation time passes the given time, or till one of the
+        stop conditions is met, see `Simulation.run`.
+        """
+        stop = stop or []
+        for condition in stop:
+            condition.prepare(self.landscape)
+        engine = self.engine
+        schedule = Schedule(observers or [], self.landscape, engine.time, t, engine.events)
+        self.stop_reason = run_until(engine.advance, lambda: (engine.time, engine.events, engine.sizes), t, stop,
+                                     check_every, schedule)
+        self.stop_time = engine.time
+
+    @property
+    def time(self) -> float:
+        return self.engine.time
+
+    @property
+    def sizes(self) -> Sequence[int]:
+        return self.engine.sizes
+
+    @property
+    def max_sizes(self) -> Sequence[int]:
+        return self.engine.max_sizes
+
+    def dominant_path(self) -> List[int]:
+        return self.engine.dominant_path()
@@ -0,0 +1,110 @@
+import pickle
+import sqlite3
+import time
+from typing import List, Dict, NamedTuple, Set, Tuple
+
+from landscape import Landscape
+from results import Result
+
+_RESULT_COLUMNS = ('config_hash TEXT NOT NULL, time REAL NOT NULL, seed INTEGER NOT NULL, fraction REAL NOT NULL, '
+                   'engine TEXT NOT NULL, replicate INTEGER NOT NULL, path TEXT, stop_time REAL, stop_reason TEXT, '
+                   'created REAL, PRIMARY KEY (config_hash, time, seed, fraction, engine, replicate)')
+# Rows of one `RunKey`
+_KEY_MATCH = 'config_hash = ? AND time = ? AND seed = ? AND fraction = ? AND engine = ?'
+
+
+class RunKey(NamedTuple):
+    """
+    Everything that decides which replicates of a config can be pooled.
+    Replicates are only reused by a run with the same key.
+    """
+    config_hash: str
+    time: float
+    # Base seed the replicate streams are derived from
+    seed: int
+    # Fraction a fully mutated type stops a replicate at, 0 for no early stop
+    fraction: float
+    # 'direct' for one stream per replicate, or 'ensemble'
+    engine: str
+
+
+class ResultStore:
+    """
+    Append only SQLite store of replicate results.
+
+    Every finished replicate is written straight away, keyed by its `RunKey`
+    and replicate number, so an interrupted set of runs can be topped up later
+    and results from many jobs can be counted without loading every path.
+    """
+
+    def __init__(self, filename: str):
+        self.filename: str = filename
+        self.__db = sqlite3.connect(filename)
+        with self.__db:
+            self.__db.execute('CREATE TABLE IF NOT EXISTS landscapes ('
+                              'config_hash TEXT PRIMARY KEY, config TEXT, landscape BLOB)')
+            self.__db.execute('CREATE TABLE IF NOT EXISTS results (' + _RESULT_COLUMNS + ')')
+
+    def close(self) -> None:
+        self.__db.close()
+
+    def __enter__(self) -> 'ResultStore':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def add_landscape(self, config_hash: str, landscape: Landscape, config: str = None) -> None:
+        with self.__db:
+            self.__db.execute('INSERT OR IGNORE INTO landscapes VALUES (?, ?, ?)',
+                              (config_hash, config, pickle.dumps(landscape.to_dict(), -1)))
+
+    def landscape(self, config_hash: str) -> Landscape:
+        row = self.__db.execute('SELECT landscape FROM landscapes WHERE config_hash = ?', (config_hash,)).fetchone()
+        if row is None:
+            raise KeyError(config_hash)
+        return Landscape.from_dict(pickle.loads(row[0]))
+
+    def add(self, key: RunKey, result: Result) -> None:
+        """
+        Write one finished replicate, replacing nothing if it is already stored.
+
+        :raises ValueError: if the result was run from another base seed
+        """
+        if result.seed is not None and result.seed != key.seed:
+            raise ValueError('Result of seed {} stored under seed {}'.format(result.seed, key.seed))
+        with self.__db:
+            self.__db.execute('INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                              key + (result.replicate, ','.join(map(str, result.path)), result.stop_time,
+                                     result.stop_reason, time.time()))
+
+    def done(self, key: RunKey) -> Set[int]:
+        """
+        :return: replicate numbers already stored
+        """
+        return {r for r, in self.__db.execute('SELECT replicate FROM results WHERE ' + _KEY_MATCH, key)}
+
+    def results(self, key: RunKey, replicates: int = None) -> List[Result]:
+        """
+        :param replicates: only return replicates numbered below this
+        :return: stored results in replicate order, without a seed if they can't be repeated on their own
+        """
+        rows = self.__db.execute('SELECT path, stop_time, stop_reason, replicate FROM results '
+                                 'WHERE ' + _KEY_MATCH + ' AND replicate < ? ORDER BY replicate',
+                                 key + (replicates if replicates is not None else 2 ** 62,))
+        seed = key.seed if key.engine == 'direct' else None
+        return [Result([int(i) for i in path.split(',')], seed, stop_time, stop_reason, replicate)
+                for path, stop_time, stop_reason, replicate in rows]
+
+    def path_counts(self, key: RunKey) -> Dict[Tuple[int, ...], int]:
+        """
+        Number of replicates with each dominant path, counted by the database.
+        """
+        rows = self.__db.execute('SELECT path, COUNT(*) FROM results WHERE ' + _KEY_MATCH + ' GROUP BY path', key)
+        return {tuple(int(i) for i in path.split(',')): n for path, n in rows}
+
+    def configs(self) -> List[Tuple[str, str]]:
+        """
+        :return: hash and config name of every stored landscape
+        """
+        return list(self.__db.execute('SELECT config_hash, config FROM landscapes'))
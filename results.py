@@ -0,0 +1,116 @@
+import pickle
+from typing import List, Dict, NamedTuple, Tuple, Any, Sequence
+
+import numpy as np
+
+from landscape import Landscape
+from type import Type
+
+FORMAT = 'dominant-paths'
+VERSION = 1
+
+
+class Result(NamedTuple):
+    """
+    Outcome of one replicate, the dominant path as indices into the landscape.
+    The replicate's random stream is `rng.replicate_seed(seed, replicate)`,
+    seed is None for replicates that can't be repeated on their own, such as
+    those run together by an `Ensemble`.
+    """
+    path: List[int]
+    seed: int = None
+    stop_time: float = None
+    stop_reason: str = None
+    replicate: int = None
+
+
+def to_dict(landscape: Landscape, results: List[Result], **metadata) -> Dict[str, Any]:
+    """
+    Compact form of a set of results. Paths are stored as one flat array of
+    type indices with offsets, next to a single copy of the landscape.
+
+    :param landscape: landscape the paths index into
+    :param results: replicate results
+    :param metadata: run information to keep with the results, e.g. config hash and time
+    """
+    ptr = np.zeros(len(results) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(r.path) for r in results])
+    return {'format': FORMAT, 'version': VERSION, 'metadata': metadata, 'landscape': landscape.to_dict(),
+            'path_ptr': ptr,
+            'path_index': np.fromiter((i for r in results for i in r.path), dtype=np.int32, count=int(ptr[-1])),
+            'seeds': [r.seed for r in results],
+            'stop_times': np.array([np.nan if r.stop_time is None else r.stop_time for r in results]),
+            'stop_reasons': [r.stop_reason for r in results],
+            'replicates': [r.replicate for r in results]}
+
+
+def from_dict(d: Dict[str, Any]) -> Tuple[Landscape, List[Result], Dict[str, Any]]:
+    if not is_results(d):
+        raise ValueError('Not a set of results')
+    ptr, index = d['path_ptr'], d['path_index']
+    replicates = d.get('replicates', [None] * len(d['seeds']))
+    results = [Result(index[ptr[i]:ptr[i + 1]].tolist(), seed,
+                      None if np.isnan(stop_time) else float(stop_time), stop_reason, replicate)
+               for i, (seed, stop_time, stop_reason, replicate) in enumerate(zip(d['seeds'], d['stop_times'].tolist(),
+                                                                                  d['stop_reasons'], replicates))]
+    return Landscape.from_dict(d['landscape']), results, d['metadata']
+
+
+def is_results(d: Any) -> bool:
+    return isinstance(d, dict) and d.get('format') == FORMAT
+
+
+def save_results(filename: str, landscape: Landscape, results: List[Result], **metadata) -> None:
+    with open(filename, 'wb') as f:
+        pickle.dump(to_dict(landscape, results, **metadata), f, -1)
+
+
+def load_results(filename: str) -> Tuple[Landscape, List[Result], Dict[str, Any]]:
+    with open(filename, 'rb') as f:
+        return from_dict(pickle.load(f))
+
+
+def merge_results(parts: Sequence[Tuple[Landscape, List[Result], Dict[str, Any]]]) \
+        -> Tuple[Landscape, List[Result], Dict[str, Any]]:
+    """
+    Combine results of the same run split into shards.
+
+    :param parts: loaded shard results, as returned by `load_results`
+    :return: landscape, results in replicate order and metadata of the whole run
+    :raises ValueError: if the parts are of different runs, or replicates are repeated or missing
+    """
+    if not parts:
+        raise ValueError('Nothing to merge')
+    landscape, _, metadata = parts[0]
+    for key in ('config_hash', 'time', 'fraction', 'seed', 'ensemble', 'replicates'):
+        values = {repr(m.get(key)) for _, _, m in parts}
+        if len(values) > 1:
+            raise ValueError('Shards have different {}: {}'.format(key, ', '.join(sorted(values))))
+
+    merged = [r for _, rs, _ in parts for r in rs]
+    if any(r.replicate is None for r in merged):
+        raise ValueError('Results without replicate numbers can\'t be merged')
+    merged.sort(key=lambda r: r.replicate)
+    duplicates = sorted({a.replicate for a, b in zip(merged, merged[1:]) if a.replicate == b.replicate})
+    if duplicates:
+        raise ValueError('Replicates in more than one shard: {}'.format(duplicates))
+    replicates = metadata.get('replicates')
+    expected = range(replicates) if replicates is not None else range(merged[-1].replicate + 1 if merged else 0)
+    missing = sorted(set(expected) - {r.replicate for r in merged})
+    if missing:
+        raise ValueError('Replicates missing: {}'.format(missing))
+
+    metadata = {k: v for k, v in metadata.items() if k != 'shard'}
+    metadata['shards'] = len(parts)
+    return landscape, merged, metadata
+
+
+def to_paths(d: Any) -> List[List[Type]]:
+    """
+    Dominant paths as lists of `Type`s, from either compact results or the
+    pickled lists of `Type`s written before.
+    """
+    if not is_results(d):
+        return d
+    landscape, results, _ = from_dict(d)
+    return [landscape.to_types(r.path) for r in results]
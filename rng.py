@@ -0,0 +1,83 @@
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+
+# Number of values generated at a time
+BLOCK = 4096
+
+Seed = Union[None, int, np.random.SeedSequence]
+
+
+def replicate_seed(base_seed: int, replicate: int) -> np.random.SeedSequence:
+    """
+    Seed of an independent stream for one replicate, so any replicate can be
+    repeated on its own from the base seed and its number.
+    """
+    return np.random.SeedSequence(base_seed, spawn_key=(replicate,))
+
+
+class RandomStream:
+    """
+    Independent stream of random numbers.
+
+    Uniforms and exponentials are generated by NumPy in blocks and handed out
+    one at a time, `random` and `standard_exponential` are bound iterator steps
+    so a draw costs about as much as a call to the `random` module.
+    """
+
+    def __init__(self, seed: Seed = None, block: int = BLOCK):
+        """
+        :param seed: integer or `SeedSequence`, fresh entropy if None
+        :param block: number of values to generate at a time
+        """
+        self.seed_sequence: np.random.SeedSequence = seed if isinstance(seed, np.random.SeedSequence) \
+            else np.random.SeedSequence(seed)
+        self.generator: np.random.Generator = np.random.Generator(np.random.PCG64(self.seed_sequence))
+        self.block: int = block
+
+        # Current block of each kind of value
+        self.__blocks: Dict[str, List[float]] = {}
+        self.__iterators: Dict[str, Iterator[float]] = {}
+        self.random = self.__stream('random', []).__next__
+        self.standard_exponential = self.__stream('exponential', []).__next__
+
+    def __stream(self, kind: str, first: List[float]) -> Iterator[float]:
+        draw = self.generator.random if kind == 'random' else self.generator.standard_exponential
+        block = first
+        while True:
+            self.__blocks[kind] = block
+            self.__iterators[kind] = iter(block)
+            yield from self.__iterators[kind]
+            block = draw(self.block).tolist()
+
+    def __getstate__(self) -> Dict:
+        # The bound iterator steps can't be pickled, so the stream is rebuilt from its state
+        return {'seed_sequence': self.seed_sequence, 'state': self.getstate()}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__(state['seed_sequence'], state['state']['block'])
+        self.setstate(state['state'])
+
+    def expovariate(self, rate: float) -> float:
+        return self.standard_exponential() / rate
+
+    def uniform(self, a: float, b: float) -> float:
+        return a + (b - a) * self.random()
+
+    def getstate(self) -> Dict:
+        """
+        Everything needed to continue this stream exactly, see `setstate`.
+        """
+        remaining = {}
+        for kind, block in self.__blocks.items():
+            # A list iterator reduces to its list and position
+            position = self.__iterators[kind].__reduce__()[2] if len(block) else 0
+            remaining[kind] = block[position:]
+        return {'bit_generator': self.generator.bit_generator.state, 'remaining': remaining, 'block': self.block}
+
+    def setstate(self, state: Dict) -> None:
+        self.generator.bit_generator.state = state['bit_generator']
+        self.block = state['block']
+        self.random = self.__stream('random', list(state['remaining'].get('random', []))).__next__
+        self.standard_exponential = self.__stream('exponential',
+                                                  list(state['remaining'].get('exponential', []))).__next__
@@ -0,0 +1,110 @@
+import math
+import queue
+import time
+from multiprocessing import Pool, cpu_count
+from typing import Callable, Dict, Hashable, Iterator, List, Sequence, Tuple
+
+# Wall time each chunk of work should take once the time per item is known
+CHUNK_SECONDS = 10.0
+# Chunks waiting or running per worker, so a worker never waits for the next
+IN_FLIGHT = 2
+# Seconds between progress lines
+PROGRESS_INTERVAL = 10.0
+
+# Arguments each task of a worker is run with, sent once when the worker starts
+_templates: Dict[Hashable, Tuple] = {}
+
+
+def _init_worker(templates: Dict[Hashable, Tuple]) -> None:
+    _templates.update(templates)
+
+
+def _run_chunk(f: Callable, key: Hashable, items: List) -> Tuple[Hashable, List, float]:
+    t0 = time.time()
+    return key, f(*_templates[key], items), time.time() - t0
+
+
+class Scheduler:
+    """
+    Runs work on a pool of long lived worker processes.
+
+    Each worker is sent the templates, e.g. the `Simulation` of a config, once
+    when it starts. Work is then handed out as chunks of items that take about
+    `chunk_seconds` each, judged from how long items have taken so far, and
+    results are yielded as soon as a chunk finishes.
+    """
+
+    def __init__(self, templates: Dict[Hashable, Tuple], processes: int = None,
+                 chunk_seconds: float = CHUNK_SECONDS, prints: bool = True):
+        """
+        :param templates: arguments given before the items to every call of the work function, by key
+        :param processes: number of workers, defaults to the number of CPUs
+        :param chunk_seconds: wall time each chunk should take
+        :param prints: print progress, throughput and time left
+        """
+        self.templates: Dict[Hashable, Tuple] = templates
+        self.processes: int = processes or cpu_count()
+        self.chunk_seconds: float = chunk_seconds
+        self.prints: bool = prints
+
+    def run(self, f: Callable, work: Sequence[Tuple[Hashable, Sequence]],
+            min_chunk: int = 1, max_chunk: int = None) -> Iterator[Tuple[Hashable, List]]:
+        """
+        Calls `f(*templates[key], chunk)` for chunks of the items of every key in
+        `work`, in the order given, and yields `(key, f's results)` in the order
+        they finish. `f` must return a list.
+
+        :param f: work function, must be defined at the top level of a module
+        :param work: pairs of template key and the items to run for it
+        :param min_chunk: smallest number of items in one chunk
+        :param max_chunk: largest number of items in one chunk
+        """
+        pending = [(key, list(items)) for key, items in work if len(items)]
+        total = sum(len(items) for _, items in pending)
+        if total == 0:
+            return
+        processes = min(self.processes, total)
+        finished: queue.Queue = queue.Queue()
+
+        done = 0
+        submitted = 0
+        running = 0
+        busy = 0.0
+        t0 = last_print = time.time()
+        with Pool(processes, initializer=_init_worker, initargs=(self.templates,)) as pool:
+            while pending or running:
+                while pending and running < processes * IN_FLIGHT:
+                    key, items = pending[0]
+                    n = self.__chunk_size(busy / done if done else None, total - submitted, processes)
+                    n = max(n, min_chunk)
+                    if max_chunk:
+                        n = min(n, max_chunk)
+                    chunk, pending[0] = items[:n], (key, items[n:])
+                    if not pending[0][1]:
+                        pending.pop(0)
+                    pool.apply_async(_run_chunk, (f, key, chunk), callback=finished.put, error_callback=finished.put)
+                    running += 1
+                    submitted += len(chunk)
+
+                result = finished.get()
+                running -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                key, results, elapsed = result
+                done += len(results)
+                busy += elapsed
+                yield key, results
+
+                if self.prints and (time.time() - last_print >= PROGRESS_INTERVAL or done == total):
+                    last_print = time.time()
+                    rate = done / max(last_print - t0, 1e-9)
+                    print('{}/{} replicates, {:.2f}/s, ETA {}'.format(
+                        done, total, rate, time.strftime('%H:%M:%S', time.gmtime((total - done) / rate))))
+
+    def __chunk_size(self, per_item: float, remaining: int, processes: int) -> int:
+        if per_item is None:
+            # Nothing has finished yet, so start small
+            return 1
+        n = max(1, int(self.chunk_seconds / per_item)) if per_item > 0 else remaining
+        # Keep every worker busy until the end
+        return min(n, math.ceil(remaining / (processes * IN_FLIGHT)))
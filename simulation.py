@@ -1,9 +1,24 @@
+import math
 import random
-from time import time
-from typing import List, Dict, Tuple
-
+from time import time, perf_counter
+from typing import List, Dict, Optional, Tuple, Sequence
+
+from checkpoint import save_checkpoint, load_checkpoint
+from engine import Engine, RESUM_INTERVAL, next_multiple, run_until
+from history import History, EventHistory, BoundedHistory, make_history
+from history_file import DiskHistory, DEFAULT_CHUNK
+from instrumentation import Instrumentation, SAMPLE_INTERVAL
+from landscape import Landscape
+from observers import Observer, Progress, Schedule
+from rng import RandomStream
+from replicate import Replicate, make_engine
+from stop_conditions import StopCondition, CHECK_INTERVAL
+from sum_tree import SumTree
 from type import Type, Event
 
+# Keyword arguments passed on to the engine, and to clones and replicates
+ENGINE_OPTIONS = ('tau_epsilon', 'tau_critical', 'hybrid_threshold', 'hybrid_mode', 'hybrid_epsilon')
+
 
 class Simulation:
     """
@@ -17,63 +32,177 @@ class Simulation:
         given amount of time
 
         :param Type types: list of Types to simulate
-        :param kwargs: Can give a max size different to the sum of the size of all types
+        :param kwargs: Can give a max size different to the sum of the size of all types,
+            and the engine to run events with, 'direct' (default), 'array', 'next_reaction', 'tau' or 'hybrid'.
+            The 'tau' engine takes `tau_epsilon` and `tau_critical`, see `TauLeapEngine`. The 'hybrid'
+            engine takes `hybrid_threshold`, `hybrid_mode` and `hybrid_epsilon`, see `HybridEngine`.
+            `history` can be True or a recording policy, 'event', 'change', 'grid' (every
+            `history_interval` time) or 'bounded' (at most `history_limit` records), see `history`.
+            Giving `history_file` streams 'event' or 'grid' history to that path in chunks of
+            `history_chunk` records, see `history_file`.
+            Random numbers come from `rng`, a `RandomStream`, or a new stream started from
+            `seed`, an integer or `SeedSequence` (see `rng.replicate_seed`). Without either the
+            stream is seeded from the `random` module.
+            A `landscape` already compiled from the types can be given to save compiling it again.
+            Giving `checkpoint_file` saves a snapshot there every `checkpoint_interval` of simulated
+            time and/or every `checkpoint_wall` seconds of run time, see `checkpoint` and `restore`.
+            With `instrument` the direct engine counts events by kind and type, and times the phases
+            of one in every `instrument_sample` events, which `run` returns as a report.
         """
         self.__types: List[Type] = types
         self.__time = 0
-        self.__history = {t: [] for t in types}
+        self.__rng: RandomStream = kwargs.get('rng', None) or RandomStream(kwargs.get('seed', random.getrandbits(64)))
+        # Bound draws of the stream, saves attribute lookups per event
+        self.__random = self.__rng.random
+        self.__exponential = self.__rng.standard_exponential
+        self.__history: History = None
+        self.__history_options: Dict[str, float] = {k[len('history_'):]: kwargs[k]
+                                                    for k in ('history_interval', 'history_limit') if k in kwargs}
+        self.__history_file: str = kwargs.get('history_file', None)
+        self.__history_chunk: int = kwargs.get('history_chunk', DEFAULT_CHUNK)
+        self.__checkpoint_file: str = kwargs.get('checkpoint_file', None)
+        self.__checkpoint_interval: float = kwargs.get('checkpoint_interval', None)
+        self.__checkpoint_wall: float = kwargs.get('checkpoint_wall', None)
 
         self.wildtype: Type = kwargs.get('wildtype', types[0])
-        self.__save_history: bool = kwargs.get('history', False)
+        # Fully mutated types, defaults to those without children
+        self.finals: List[Type] = kwargs.get('finals', None) or [t for t in types if not t.children]
         self.__prints: bool = kwargs.get('prints', False)
+        self.__instrument: bool = kwargs.get('instrument', False)
+        self.__instrument_sample: int = kwargs.get('instrument_sample', SAMPLE_INTERVAL)
+        self.__instruments: Instrumentation = None
+
+        # A landscape already compiled from these types can be given, e.g. when loaded from a cache
+        self.__landscape: Landscape = kwargs.get('landscape', None)
+        if self.__landscape is not None and (len(self.__landscape) != len(types) or
+                                             any(a is not b for a, b in zip(self.__landscape.types, types))):
+            raise ValueError('Landscape is not of the types given')
 
         self.__size: int = 0
         self.init_types()
 
         self.__tmax: int = 0
+        self.__stop_reason: str = None
+        self.__stop_time: float = None
         # Set population maximum equal to initial population
         self.__pop_max: int = kwargs.get('max', self.__size)
 
-        self.probability: Dict[Event, float] = {Event.BIRTH: sum([t.probability(Event.BIRTH) for t in self.__types]),
-                                                Event.DEATH: sum([t.probability(Event.DEATH) for t in self.__types])}
-        self.probability_total = sum(self.probability.values())
+        # Per type birth and death propensities, indexed by position in the list of types
+        self.__index: Dict[Type, int] = {t: i for i, t in enumerate(self.__types)}
+        self.__birth_rates: List[float] = [t.rates[Event.BIRTH] for t in self.__types]
+        self.__death_rates: List[float] = [t.rates[Event.DEATH] for t in self.__types]
+        self.__birth = SumTree([t.probability(Event.BIRTH) for t in self.__types])
+        self.__death = SumTree([t.probability(Event.DEATH) for t in self.__types])
+        self.probability: Dict[Event, SumTree] = {Event.BIRTH: self.__birth, Event.DEATH: self.__death}
+        self.probability_total = self.__birth.total + self.__death.total
+        self.__events: int = 0
+        self.__sizes: List[int] = [t.size for t in self.__types]
+        self.__changes: List[Tuple[int, int]] = []
+
+        self.__engine_name: str = kwargs.get('engine', 'direct')
+        self.__engine_options: Dict[str, float] = {k: kwargs[k] for k in ENGINE_OPTIONS if k in kwargs}
+        # The direct method runs on the types themselves, other engines on the landscape
+        self.__engine: Engine = None if self.__engine_name == 'direct' else \
+            make_engine(self.__engine_name, self.get_landscape(), self.__pop_max, rng=self.__rng,
+                        **self.__engine_options)
+        if self.__instrument and self.__engine is not None:
+            raise ValueError('Instrumentation is only available with the direct engine')
+        self.set_history(kwargs.get('history', False))
 
     def init_types(self):
         for t in self.__types:
-            t.sim_init()
+            # Types compiled into a landscape have already been checked
+            if self.__landscape is None:
+                t.sim_init()
             self.__size += t.size
 
-    def run(self, t: float) -> None:
+    def run(self, t: float, stop: List[StopCondition] = None, check_every: int = CHECK_INTERVAL,
+            observers: List[Observer] = None) -> Optional[Dict]:
         """
         Runs the simulation.
 
-        Will run till the simulation time passes the given time.
+        Will run till the simulation time passes the given time, or till one of
+        the stop conditions is met. Why and when the run ended can be found with
+        `get_stop_reason` and `get_stop_time`.
 
         :param t: when to run the simulation till
+        :param stop: conditions to end the run early
+        :param check_every: number of events between checks of the stop conditions
+        :param observers: called on a grid of simulated time or every so many events, see `Observer`
+        :return: with `instrument`, the report of this run, see `Instrumentation.report`
         """
+        self.__tmax = t
+        stop = stop or []
+        observers = list(observers or [])
+        # Compiled only when something looks at it, the direct method runs on the types themselves
+        landscape = self.get_landscape() if stop or observers else None
+        for condition in stop:
+            condition.prepare(landscape)
+        self.__stop_reason = None
+        checkpoints = self.__checkpoint_file is not None
+        interval = self.__checkpoint_interval if checkpoints else None
+        wall = self.__checkpoint_wall if checkpoints else None
+
+        if self.__prints:
+            print("Running till time {}".format(t))
+            observers.append(Progress())
+        t0 = last_checkpoint = time()
+        next_checkpoint = next_multiple(self.__time, interval) if interval else math.inf
+        start_events = self.__event_count()
+        if self.__instrument:
+            self.__instruments = Instrumentation([s.name for s in self.__types], self.__instrument_sample)
+
+        def checkpoint() -> None:
+            nonlocal last_checkpoint, next_checkpoint
+            if self.__time >= next_checkpoint or (wall and time() - last_checkpoint >= wall):
+                self.checkpoint()
+                last_checkpoint = time()
+            if self.__time >= next_checkpoint:
+                next_checkpoint = next_multiple(self.__time, interval)
+
+        schedule = Schedule(observers, landscape, self.__time, t, start_events)
+        self.__stop_reason = run_until(self.__advance, self.__state, t, stop, check_every, schedule,
+                                       interval=interval, checked=bool(wall), after=checkpoint if checkpoints else None)
+
+        self.__stop_time = self.__time
+        if self.__engine is not None:
+            self.__engine.sync()
+        self.__flush_history()
         if self.__prints:
-            self.__run_with_prints(t)
+            print("Simulation complete in {:f}s ({})".format(time() - t0, self.__stop_reason))
+        if self.__instruments is not None:
+            report = self.__instruments.report(self.__event_count() - start_events, time() - t0)
+            self.__instruments = None
+            return report
+
+    def __advance(self, t: float, max_events: int = None) -> None:
+        # Run events till the simulation time passes t, or the maximum number of events have happened
+        if self.__engine is None:
+            # Chosen once here, so runs without instrumentation pay nothing for it
+            cycle = self.__cycle if self.__instruments is None else self.__counted_cycle
+            # With no propensity left, every type has died out or can't change, so nothing can happen any more
+            if max_events is None:
+                while self.__time < t and self.probability_total > 0:
+                    cycle()
+            else:
+                n = 0
+                while self.__time < t and n < max_events and self.probability_total > 0:
+                    cycle()
+                    n += 1
+            if self.__time < t and self.probability_total <= 0:
+                self.__time = t
         else:
-            self.__run_silent(t)
+            self.__engine.advance(t, max_events)
+            self.__time = self.__engine.time
 
-    def __run_silent(self, t: float) -> None:
-        self.__tmax = t
-        while self.__time < t:
-            self.__cycle()
+    def __state(self) -> Tuple[float, int, Sequence[int]]:
+        return self.__time, self.__event_count(), self.__current_sizes()
 
-    def __run_with_prints(self, t: float) -> None:
-        self.__tmax = t
-        print("Running till time {}".format(t))
-        maximum_percentage = -1
-        t0 = time()
-        while self.__time < t:
-            percentage_completed = int((self.__time * 100) / t)
-            if percentage_completed > maximum_percentage:
-                maximum_percentage = percentage_completed
-                if maximum_percentage % 10 == 0:
-                    print("{}%\t{:f}s".format(maximum_percentage, time() - t0))
-            self.__cycle()
-        print("Simulation complete in {:f}s".format(time() - t0))
+    def __current_sizes(self) -> Sequence[int]:
+        return self.__sizes if self.__engine is None else self.__engine.sizes
+
+    def __event_count(self) -> int:
+        return self.__events if self.__engine is None else self.__engine.events
 
     def __cycle(self):
         # Move time forwards
@@ -86,9 +215,9 @@ class Simulation:
             d = self.__choose_event(Event.DEATH)
             # Only update with death if types are different, otherwise they cancel
             if d != t and d is not None:
-                d.update(Event.DEATH, self.__time)
-                t.update(Event.BIRTH, self.__time)
-            # Update with nothing happens in final for loop if d == t
+                self.__apply(d, Event.DEATH)
+                self.__apply(t.choose_mutation(self.__rng), Event.BIRTH)
+            # If d == t nothing happens
             # If d is None, there are no types that can die (all types have 0 death rate?)
             #  therefore just plateau the population
 
@@ -96,54 +225,132 @@ class Simulation:
         # as all types may have died out
         elif t is not None:
             # Update initial type choice with operation
-            # May result in mutation and operation to different type
-            t.update(op, self.__time)
+            # A birth may result in a mutation to a different type
+            self.__apply(t.choose_mutation(self.__rng) if op == Event.BIRTH else t, op)
 
-        s = 0.0
-        p_birth = 0.0
-        p_death = 0.0
+        self.__events += 1
+        if self.__events % RESUM_INTERVAL == 0 or self.__size == 0:
+            # Running totals drift from accumulated float error, sum them again from scratch
+            self.__resum()
+        else:
+            self.probability_total = self.__birth.total + self.__death.total
 
-        for t in self.__types:
-            update = t.update(Event.NOTHING, self.__time)
-            if self.__save_history:
-                self.__history[t].append((update, self.__time))
-            s += update
-            p_birth += t.probability(Event.BIRTH)
-            p_death += t.probability(Event.DEATH)
-
-        self.__size = s
-        self.probability[Event.BIRTH] = p_birth
-        self.probability[Event.DEATH] = p_death
-        self.probability_total = p_birth + p_death
+        if self.__history is not None:
+            self.__history.record(self.__time, self.__sizes, self.__changes)
+        self.__changes = []
+
+    def __counted_cycle(self) -> None:
+        # `__cycle` with the same draws in the same order, counting the event and timing its phases if sampled,
+        # kept equivalent to it by test_simulation.py
+        instruments = self.__instruments
+        timed = instruments.timed()
+        clock = [perf_counter()] if timed else None
+
+        self.__time += self.__time_nothing
+        t, op = self.__choose_event_any()
+        paired = op == Event.BIRTH and self.__size >= self.__pop_max
+        d = self.__choose_event(Event.DEATH) if paired else None
+        if timed:
+            clock.append(perf_counter())
+
+        m = None
+        if t is not None and op == Event.BIRTH and (not paired or (d != t and d is not None)):
+            m = t.choose_mutation(self.__rng)
+        if timed:
+            clock.append(perf_counter())
+
+        if m is not None:
+            if paired:
+                self.__apply(d, Event.DEATH)
+            self.__apply(m, Event.BIRTH)
+        elif t is not None and op == Event.DEATH:
+            self.__apply(t, Event.DEATH)
+        if timed:
+            clock.append(perf_counter())
+
+        self.__events += 1
+        if self.__events % RESUM_INTERVAL == 0 or self.__size == 0:
+            self.__resum()
+        else:
+            self.probability_total = self.__birth.total + self.__death.total
+        if timed:
+            clock.append(perf_counter())
+
+        if self.__history is not None:
+            self.__history.record(self.__time, self.__sizes, self.__changes)
+        self.__changes = []
+        if timed:
+            clock.append(perf_counter())
+            instruments.time(clock)
+
+        kinds = instruments.kinds
+        if t is None:
+            kinds['nothing'] += 1
+        elif op == Event.DEATH:
+            kinds['death'] += 1
+            instruments.deaths[self.__index[t]] += 1
+        elif m is None:
+            # A birth at the maximum whose paired death was of the same type, or of no type at all
+            kinds['cancelled' if d is not None else 'nothing'] += 1
+        elif paired and m == d:
+            # The child is of the type that just died, whose update for this time drops the birth
+            kinds['cancelled'] += 1
+            instruments.deaths[self.__index[d]] += 1
+        else:
+            kinds['paired' if paired else 'birth'] += 1
+            instruments.births[self.__index[t]] += 1
+            if paired:
+                instruments.deaths[self.__index[d]] += 1
+            if m != t:
+                kinds['mutation'] += 1
+                instruments.mutations[self.__index[t]] += 1
+
+    def __apply(self, t: Type, op: Event) -> None:
+        # Update a single type and adjust the running totals by its change in size
+        size = t.size
+        # A mutation event cannot itself mutate
+        t.update(op, self.__time, False)
+        change = t.size - size
+        if change:
+            self.__size += change
+            i = self.__index[t]
+            self.__sizes[i] = t.size
+            self.__changes.append((i, change))
+            self.__birth.set(i, self.__birth_rates[i] * t.size)
+            self.__death.set(i, self.__death_rates[i] * t.size)
+
+    def __resum(self) -> None:
+        self.__birth.rebuild()
+        self.__death.rebuild()
+        self.probability_total = self.__birth.total + self.__death.total
 
     @property
     def __time_nothing(self) -> float:
         # return -1.0 * np.log(1.0 - np.random.uniform()) / self.probability_total
-        return random.expovariate(self.probability_total)
+        return self.__exponential() / self.probability_total
 
     def __choose_event_any(self) -> (Type, Event):
         if self.probability_total == 0:
             # All types have died out
             return None, Event.NOTHING
         # n = np.random.uniform(high=self.probability_total)
-        n = random.random() * self.probability_total
+        n = self.__random() * self.probability_total
 
-        if n < self.probability[Event.BIRTH]:
+        birth_total = self.__birth.total
+        if n < birth_total:
             return self.__choose_event(Event.BIRTH, n), Event.BIRTH
-        return self.__choose_event(Event.DEATH, n - self.probability[Event.BIRTH]), Event.DEATH
+        return self.__choose_event(Event.DEATH, n - birth_total), Event.DEATH
 
     def __choose_event(self, s: Event, n: float = None) -> Type:
+        tree = self.probability[s]
         if n is None:
             # n = np.random.uniform(high=self.probability[s])
-            n = random.random() * self.probability[s]
-
-        total = 0.0
-        # Loop through types
-        for e in self.__types:
-            total += e.probability(s)
-            # If argument is within the new total, we've found the operation it applies to
-            if n < total:
-                return e
+            n = self.__random() * tree.total
+
+        # Sum tree finds the type the argument falls within in O(log(number of types))
+        i = tree.find(n)
+        if i < len(self.__types):
+            return self.__types[i]
         # Argument was outside of possible values
         # raise ValueError
 
@@ -157,6 +364,21 @@ class Simulation:
     def get_pop_max(self) -> int:
         return self.__pop_max
 
+    def get_stop_reason(self) -> str:
+        """
+        :return: 'time' if the last run reached its end time, otherwise the reason of the stop condition met
+        """
+        return self.__stop_reason
+
+    def get_stop_time(self) -> float:
+        return self.__stop_time
+
+    def get_events(self) -> int:
+        """
+        :return: number of events run so far, leaps count each event they stand for
+        """
+        return self.__event_count()
+
     def get_dominant_path(self) -> List[Type]:
         path: List[Type] = []
         # Find largest type at end of simulation
@@ -171,33 +393,142 @@ class Simulation:
             path.append(t)
         return path
 
-    def set_history(self, b: bool):
-        self.__save_history = b
+    def get_rng(self) -> RandomStream:
+        return self.__rng
+
+    def get_landscape(self) -> Landscape:
+        if self.__landscape is None:
+            self.__landscape = Landscape(self.__types, self.wildtype, self.finals)
+        return self.__landscape
+
+    def set_history(self, b):
+        """
+        :param b: True or a recording policy to record history from now on, False to stop
+        """
+        if b:
+            self.__history = make_history('event' if b is True else b, len(self.__types), **self.__history_options)
+            if self.__history_file is not None:
+                if not isinstance(self.__history, EventHistory) or isinstance(self.__history, BoundedHistory):
+                    raise ValueError('Only \'event\' or \'grid\' history can be written to a file')
+                self.__history = DiskHistory(self.__history_file, self.__history, [t.name for t in self.__types],
+                                             self.__history_chunk, full_names=[t.full_name for t in self.__types],
+                                             pop_max=self.__pop_max)
+            self.__history.start(self.__time, [t.size for t in self.__types])
+        else:
+            self.__history = None
+        if self.__engine is not None:
+            self.__engine.history = self.__history
+
+    def __flush_history(self) -> None:
+        if isinstance(self.__history, DiskHistory):
+            self.__history.flush()
+
+    def checkpoint(self, filename: str = None) -> None:
+        """
+        Save a snapshot of the run, sizes, time, maximum sizes, random stream and
+        history so far. Saving doesn't change the run in any way.
+
+        :param filename: where to save, defaults to the `checkpoint_file` option
+        """
+        filename = filename or self.__checkpoint_file
+        if filename is None:
+            raise ValueError('No checkpoint file given')
+        if self.__engine is None:
+            engine = {'time': self.__time, 'events': self.__events, 'sizes': self.__sizes[:],
+                      'max_sizes': [t.max_size for t in self.__types], 'type_times': [t.time for t in self.__types],
+                      'birth': self.__birth, 'death': self.__death}
+        else:
+            engine = self.__engine.getstate()
+        save_checkpoint(filename, {'names': [t.name for t in self.__types], 'pop_max': self.__pop_max,
+                                   'engine_name': self.__engine_name, 'engine': engine,
+                                   'rng': self.__rng.getstate(), 'history': self.__history})
+
+    def restore(self, filename: str = None) -> None:
+        """
+        Continue from a snapshot saved by `checkpoint`. This simulation must have
+        been made from the same types and options as the one saved, running it on
+        continues exactly as the saved one would have.
+
+        :param filename: snapshot to load, defaults to the `checkpoint_file` option
+        """
+        state = load_checkpoint(filename or self.__checkpoint_file)
+        if state['names'] != [t.name for t in self.__types] or state['pop_max'] != self.__pop_max or \
+                state['engine_name'] != self.__engine_name:
+            raise ValueError('Checkpoint is of a different simulation')
+
+        engine = state['engine']
+        if self.__engine is None:
+            self.__events = engine['events']
+            for t, s, m, u in zip(self.__types, engine['sizes'], engine['max_sizes'], engine['type_times']):
+                t.size, t.max_size, t.time = s, m, u
+            self.__sizes = list(engine['sizes'])
+            self.__size = sum(self.__sizes)
+            self.__changes = []
+            self.__birth, self.__death = engine['birth'], engine['death']
+            self.probability = {Event.BIRTH: self.__birth, Event.DEATH: self.__death}
+            self.probability_total = self.__birth.total + self.__death.total
+        else:
+            self.__engine.setstate(engine)
+            self.__engine.sync()
+        self.__time = engine['time']
+
+        self.__rng.setstate(state['rng'])
+        self.__random = self.__rng.random
+        self.__exponential = self.__rng.standard_exponential
+        self.__history = state['history']
+        if self.__engine is not None:
+            self.__engine.history = self.__history
+
+    def __getstate__(self) -> Dict:
+        # The bound steps of the random stream can't be pickled, they are bound again when unpickled
+        state = self.__dict__.copy()
+        del state['_Simulation__random'], state['_Simulation__exponential']
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self.__random = self.__rng.random
+        self.__exponential = self.__rng.standard_exponential
 
     def get_history(self, t: Type) -> List[Tuple[int, float]]:
-        return self.__history[t]
+        return list(zip(self.get_sizes(t), self.get_times(t)))
 
-    def get_times(self, t: Type) -> List[float]:
-        return list(list(zip(*self.__history[t]))[1])
+    def get_times(self, t: Type) -> Sequence[float]:
+        return self.__history.times(self.__index[t]) if self.__history is not None else []
 
-    def get_sizes(self, t: Type) -> List[float]:
-        return list(list(zip(*self.__history[t]))[0])
+    def get_sizes(self, t: Type) -> Sequence[int]:
+        return self.__history.sizes(self.__index[t]) if self.__history is not None else []
 
     def check_history(self) -> bool:
-        return self.__save_history
+        return self.__history is not None
 
-    def clone(self) -> 'Simulation':
+    def replicate(self, seed=None) -> Replicate:
+        """
+        A run of this simulation's landscape from its starting sizes, which shares
+        the landscape instead of copying the types, see `Replicate`.
+
+        :param seed: seed of the replicate's random stream, see `RandomStream`
+        """
+        return Replicate(self.get_landscape(), self.__pop_max, self.__engine_name, seed,
+                         **self.__engine_options)
+
+    def clone(self, seed=None) -> 'Simulation':
+        """
+        :param seed: seed of the clone's random stream, see `RandomStream`
+        """
         cloned_types: List[Type] = [t.clone() for t in self.__types]
+        cloned: Dict[Type, Type] = {t: c for t, c in zip(self.__types, cloned_types)}
 
-        for sim_type in self.__types:
-            cloned_type = cloned_types[cloned_types.index(sim_type)]
+        for sim_type, cloned_type in zip(self.__types, cloned_types):
             for mutant_type, p in sim_type.mutations:
-                cloned_mutant = cloned_types[cloned_types.index(mutant_type)]
-                cloned_type.add_mutation(cloned_mutant, p)
+                cloned_type.add_mutation(cloned[mutant_type], p)
             for parent_type in sim_type.parents:
-                cloned_type.add_parent(cloned_types[cloned_types.index(parent_type)])
+                cloned_type.add_parent(cloned[parent_type])
             for child_type in sim_type.children:
-                cloned_type.add_child(cloned_types[cloned_types.index(child_type)])
+                cloned_type.add_child(cloned[child_type])
 
-        cloned_wildtype = cloned_types[cloned_types.index(self.wildtype)]
-        return Simulation(cloned_types, max=self.__pop_max, wildtype=cloned_wildtype)
+        cloned_wildtype = cloned[self.wildtype]
+        cloned_finals = [cloned[t] for t in self.finals]
+        return Simulation(cloned_types, max=self.__pop_max, wildtype=cloned_wildtype, finals=cloned_finals,
+                          engine=self.__engine_name, seed=seed if seed is not None else random.getrandbits(64),
+                          **self.__engine_options)
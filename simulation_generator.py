@@ -1,16 +1,30 @@
+import hashlib
 import itertools
 import json
+import os
+import pickle
+import tempfile
 from collections import namedtuple
-from functools import reduce
-from typing import List, Set, Tuple, Dict, Sequence
+from os.path import join
+from typing import List, Tuple, Dict, Sequence
 
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
 
 from data_plot import network
+from landscape import Landscape
 from simulation import Simulation
 from type import Type
 
+# Changed whenever `Generator.parameters` would build a different landscape from the same config,
+# so cached landscapes from before are not used
+GENERATOR_VERSION = 2
+# Folder compiled landscapes are cached in when caching is asked for
+CACHE = 'data/landscapes'
+# Permissions of cached landscapes, readable by everyone sharing the folder
+CACHE_MODE = 0o644
+
 
 class ParameterError(Exception):
     def __init__(self, s):
@@ -20,19 +34,123 @@ class ParameterError(Exception):
         return 'Parameter error: ' + self.message
 
 
+class SequenceIndex:
+    """
+    All sequences of a landscape, encoded as mixed radix integers with one
+    digit per locus giving which of that locus' alleles it has.
+
+    The first locus is the most significant digit, so codes count up in the
+    same order as `itertools.product` lists the sequences, and the single
+    mutation neighbours of a sequence are found by changing one digit instead
+    of comparing it with every other sequence.
+    """
+
+    def __init__(self, wildtype: Tuple[str], mutated: List[Tuple[str]]):
+        # Alleles of each locus in order of first appearance, the wildtype's first
+        self.alleles: List[List[str]] = [Generator.remove_duplicates(a) for a in zip(wildtype, *mutated)]
+        self.__digit: List[Dict[str, int]] = [{a: d for d, a in enumerate(alleles)} for alleles in self.alleles]
+        self.radix: List[int] = [1] * len(self.alleles)
+        for locus in range(len(self.alleles) - 2, -1, -1):
+            self.radix[locus] = self.radix[locus + 1] * len(self.alleles[locus + 1])
+        self.sequences: List[Tuple[str, ...]] = list(itertools.product(*self.alleles))
+
+        # Mutations from the wildtype, whose digits are all 0
+        distances = np.zeros(len(self.sequences), dtype=np.int64)
+        codes = np.arange(len(self.sequences))
+        for radix, alleles in zip(self.radix, self.alleles):
+            distances += (codes // radix) % len(alleles) != 0
+        self.__distances: List[int] = distances.tolist()
+
+    def code(self, seq: Sequence[str]) -> int:
+        return sum(digit[a] * radix for digit, a, radix in zip(self.__digit, seq, self.radix))
+
+    def distance(self, code: int) -> int:
+        """
+        :return: number of loci where the sequence differs from the wildtype
+        """
+        return self.__distances[code]
+
+    def neighbours(self, code: int) -> List[int]:
+        """
+        :return: codes of the sequences one mutation away, in ascending order
+        """
+        result = []
+        for radix, alleles in zip(self.radix, self.alleles):
+            current = (code // radix) % len(alleles)
+            result.extend(code + (d - current) * radix for d in range(len(alleles)) if d != current)
+        result.sort()
+        return result
+
+    def layers(self) -> List[List[int]]:
+        """
+        :return: codes of the sequences by their distance from the wildtype, each in ascending order
+        """
+        result: List[List[int]] = [[] for _ in range(max(self.__distances) + 1)]
+        for code, distance in enumerate(self.__distances):
+            result[distance].append(code)
+        return result
+
+
 class Generator:
     Mutation = namedtuple('Mutation', ['source', 'target'])
 
-    def __init__(self, **kwargs):
-        self.__save_history: bool = kwargs.get('history', False)
-        self.__prints: bool = kwargs.get('prints', False)
+    def __init__(self, cache: str = None, **kwargs):
+        """
+        :param cache: folder compiled landscapes of config files are cached in, e.g. `CACHE`, None to not cache
+        :param kwargs: passed on to every Simulation made, e.g. history, prints or engine
+        """
+        self.__cache: str = cache
+        self.__simulation_kwargs = kwargs
 
-    def config_file(self, filename: str) -> Simulation:
+    @staticmethod
+    def read_config(filename: str) -> Dict:
         if '.json' != filename[-5:]:
             filename += '.json'
         with open(filename, 'r') as f:
-            config = json.load(f)
+            return json.load(f)
 
+    @staticmethod
+    def config_hash(config: Dict) -> str:
+        # Hash of the contents, independent of key order and whitespace in the file
+        return hashlib.sha256(json.dumps(config, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+    @staticmethod
+    def cache_key(config: Dict) -> str:
+        # Landscapes built by a different version of the generator are never used
+        return '{}-v{}'.format(Generator.config_hash(config), GENERATOR_VERSION)
+
+    def config_file(self, filename: str) -> Simulation:
+        config = self.read_config(filename)
+        if self.__cache is None:
+            return self.__config(config)
+
+        path = join(self.__cache, self.cache_key(config) + '.landscape')
+        try:
+            with open(path, 'rb') as f:
+                cached = pickle.load(f)
+            landscape = Landscape.from_dict(cached['landscape'])
+        except (OSError, EOFError, KeyError, ValueError, pickle.UnpicklingError):
+            # Not cached yet, or unreadable, so build it again
+            sim = self.__config(config)
+            self.__save_cached(path, sim)
+            return sim
+        return Simulation(list(landscape.types), max=cached['pop_max'],
+                          wildtype=landscape.types[landscape.wildtype],
+                          finals=[landscape.types[i] for i in landscape.finals], landscape=landscape,
+                          **self.__simulation_kwargs)
+
+    @staticmethod
+    def __save_cached(path: str, sim: Simulation) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Written to a temporary file and moved into place, so other processes never read half a file
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'landscape': sim.get_landscape().to_dict(), 'pop_max': sim.get_pop_max()}, f, -1)
+        # Temporary files are only readable by their owner
+        os.chmod(temporary, CACHE_MODE)
+        os.replace(temporary, path)
+
+    def __config(self, config: Dict) -> Simulation:
         config['wildtype'] = tuple(config['wildtype'])
         for i, m in enumerate(config['mutated']):
             config['mutated'][i] = tuple(m)
@@ -64,7 +182,8 @@ class Generator:
         if not wildtype_size:
             wildtype_size = size
 
-        all_seq = self.all_seq(wildtype, mutated)
+        index = SequenceIndex(wildtype, mutated)
+        all_seq = index.sequences
 
         types: Dict[Tuple, Type] = dict()
 
@@ -74,16 +193,18 @@ class Generator:
             types[seq] = Type(''.join(seq), wildtype_size if seq == wildtype else 0,
                               *rates.get(seq, default_rate))
 
-        sources = {wildtype}
-        used_sources = set()
+        # Layer i holds the sequences i mutations from the wildtype, which is the order they were reached in
+        layers = index.layers()
         finals = []
         for i in range(0, len(wildtype) + 1):
+            sources = [all_seq[c] for c in layers[i]] if i < len(layers) else []
             finals = sources
-            sorted_sources = sorted(list(sources), key=lambda x: ''.join(x), reverse=True)
+            sorted_sources = sorted(sources, key=lambda x: ''.join(x), reverse=True)
             for s, source in enumerate(sorted_sources):
                 types[source].pos = (i, s / len(sources))
 
-                targets = self.partial_match(source, all_seq) - used_sources
+                # Neighbours not in an earlier layer, in sequence order
+                targets = [all_seq[c] for c in index.neighbours(index.code(source)) if index.distance(c) >= i]
 
                 for target in targets:
                     types[source].add_mutation(types[target], mutation_rates.get(self.Mutation(source, target),
@@ -95,29 +216,8 @@ class Generator:
                     types[source].add_child(types[target])
                     types[target].add_parent(types[source])
 
-            used_sources |= sources
-            sources = self.partial_match_list(sources, all_seq) - used_sources
-
         return Simulation(list(types.values()), max=size, wildtype=types[wildtype],
-                          finals=[types[t] for t in finals], history=self.__save_history, prints=self.__prints)
-
-    @staticmethod
-    def all_seq(wildtype: Tuple[str], mutated: List[Tuple[str]]) -> List:
-        # Given the wildtype and list of fully mutated types,
-        # create all intermediate stages
-        return Generator.remove_duplicates(itertools.product(*zip(wildtype, *mutated)))
-
-    @staticmethod
-    def partial_match_list(sources, all_seq) -> Set:
-        # partial match for every source, chain together results, remove repeats
-        return set(
-            itertools.chain.from_iterable(map(lambda x: Generator.partial_match(x, all_seq), sources)))
-
-    @staticmethod
-    def partial_match(source, all_seq) -> Set:
-        return set([target for target in all_seq if
-                    # reduce(lambda x, y: x + 1 if y[0] != y[1] else x, zip(wildtype, target), 0) == l and
-                    reduce(lambda x, y: x + 1 if y[0] != y[1] else x, zip(source, target), 0) == 1])
+                          finals=[types[t] for t in finals], **self.__simulation_kwargs)
 
     @staticmethod
     def remove_duplicates(seq) -> List:
@@ -0,0 +1,75 @@
+from typing import Callable, Sequence, List
+
+from landscape import Landscape
+
+# Default number of events between checks of stop conditions
+CHECK_INTERVAL = 10000
+
+
+class StopCondition:
+    """
+    Condition for ending a run before its end time.
+
+    Runs only check conditions every so many events, so a check can look at
+    every type without slowing the simulation down.
+    """
+    reason = 'stopped'
+
+    def prepare(self, landscape: Landscape) -> None:
+        """
+        Called once before a run with the landscape being simulated, sizes given
+        to `check` are indexed in the same order.
+        """
+        pass
+
+    def check(self, sizes: Sequence[int], time: float) -> bool:
+        raise NotImplementedError
+
+
+class FinalDominance(StopCondition):
+    """
+    Stops when a fully mutated type makes up at least `fraction` of the population.
+    """
+    reason = 'final dominance'
+
+    def __init__(self, fraction: float = 0.5):
+        if not 0 < fraction <= 1:
+            raise ValueError('Fraction must be in (0, 1]')
+        self.fraction: float = fraction
+        self.__finals: List[int] = []
+
+    def prepare(self, landscape: Landscape) -> None:
+        self.__finals = list(landscape.finals)
+
+    def check(self, sizes: Sequence[int], time: float) -> bool:
+        total = sum(sizes)
+        return total > 0 and any(sizes[i] >= self.fraction * total for i in self.__finals)
+
+
+class WildtypeExtinct(StopCondition):
+    """
+    Stops when the wildtype has died out.
+    """
+    reason = 'wildtype extinct'
+
+    def __init__(self):
+        self.__wildtype: int = 0
+
+    def prepare(self, landscape: Landscape) -> None:
+        self.__wildtype = landscape.wildtype
+
+    def check(self, sizes: Sequence[int], time: float) -> bool:
+        return sizes[self.__wildtype] == 0
+
+
+class Predicate(StopCondition):
+    """
+    Stops when `f(sizes, time)` is true.
+    """
+
+    def __init__(self, f: Callable[[Sequence[int], float], bool], reason: str = 'predicate'):
+        self.f = f
+        self.reason = reason
+
+    def check(self, sizes: Sequence[int], time: float) -> bool:
+        return self.f(sizes, time)
@@ -0,0 +1,74 @@
+from typing import List, Sequence
+
+
+class SumTree:
+    """
+    Fenwick (binary indexed) tree over non-negative weights.
+
+    Changing a weight and sampling an index with probability proportional
+    to its weight both take O(log n), instead of the O(n) cumulative scan.
+    """
+
+    def __init__(self, values: Sequence[float]):
+        self.__n: int = len(values)
+        self.__values: List[float] = list(values)
+        self.__tree: List[float] = [0.0] * (self.__n + 1)
+        self.total: float = 0.0
+
+        # Largest power of two not above n, the first step of the descent in `find`
+        self.__step: int = 1
+        while self.__step * 2 <= self.__n:
+            self.__step *= 2
+
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Rebuild the tree from the stored weights in O(n), discarding any float
+        error accumulated by previous calls to `set`.
+        """
+        tree = [0.0] + self.__values
+        for i in range(1, self.__n + 1):
+            j = i + (i & -i)
+            if j <= self.__n:
+                tree[j] += tree[i]
+        self.__tree = tree
+        self.total = sum(self.__values)
+
+    def set(self, i: int, value: float) -> None:
+        delta = value - self.__values[i]
+        if delta == 0:
+            return
+        self.__values[i] = value
+        self.total += delta
+        tree = self.__tree
+        n = self.__n
+        i += 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def find(self, x: float) -> int:
+        """
+        Find the first index whose cumulative weight is greater than `x`.
+
+        :param x: value in [0, total)
+        :return: index of the chosen weight, or `len(self)` if `x` is outside of the total
+        """
+        tree = self.__tree
+        n = self.__n
+        pos = 0
+        step = self.__step
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= x:
+                pos = nxt
+                x -= tree[nxt]
+            step >>= 1
+        return pos
+
+    def __getitem__(self, i: int) -> float:
+        return self.__values[i]
+
+    def __len__(self) -> int:
+        return self.__n
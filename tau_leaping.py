@@ -0,0 +1,190 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from engine import Engine
+from history import History
+from landscape import Landscape
+from rng import RandomStream
+
+# A leap shorter than this many expected exact events is not worth taking
+SSA_FACTOR = 10.0
+# Number of exact events run instead of a leap that would be too short
+SSA_STEPS = 100
+
+
+class TauLeapEngine(Engine):
+    """
+    Approximate engine using tau-leaping.
+
+    Each leap draws Poisson birth and death counts for every type, and splits
+    births between mutation targets with a multinomial draw. The leap length is
+    chosen so that no type is expected to change by more than a fraction
+    `epsilon` of its size. Types smaller than `critical` are not leapt, their
+    events are run exactly one at a time, so rare mutants behave as in the
+    direct method. When a leap would be too short to be worthwhile, a batch of
+    exact events is run instead.
+    """
+
+    def __init__(self, landscape: Landscape, pop_max: int, history: Optional[History] = None,
+                 epsilon: float = 0.03, critical: int = 10, rng: RandomStream = None):
+        """
+        :param landscape: compiled types to simulate
+        :param pop_max: population size at which births are paired with a death
+        :param history: optional history to record to after every step
+        :param epsilon: error control, largest expected relative change of a type in one leap
+        :param critical: types smaller than this are simulated exactly
+        :param rng: random stream whose NumPy generator is drawn from, a new unseeded one if not given
+        """
+        super().__init__(landscape, pop_max, history, rng)
+        self.epsilon: float = epsilon
+        self.critical: int = critical
+
+        self.sizes: np.ndarray = landscape.initial_sizes.copy()
+        self.max_sizes: np.ndarray = self.sizes.copy()
+
+        self.__rng: np.random.Generator = self.rng.generator
+        self.__birth_rates = landscape.birth
+        self.__death_rates = landscape.death
+        # Mutation probabilities of each type normalised to sum to one
+        self.__mutation_rows = [landscape.mutation_probability[landscape.mutation_ptr[i]:landscape.mutation_ptr[i + 1]]
+                                / landscape.mutation_total[i] for i in range(len(landscape))]
+        self.__mutation_targets = [landscape.mutation_index[landscape.mutation_ptr[i]:landscape.mutation_ptr[i + 1]]
+                                   for i in range(len(landscape))]
+        self.__mutation_probability_flat = np.concatenate(self.__mutation_rows)
+        self.__mutation_targets_flat = landscape.mutation_index
+        self.__mutation_sources = np.repeat(np.arange(len(landscape)), np.diff(landscape.mutation_ptr))
+
+    def advance(self, until: float, max_events: int = None) -> int:
+        """
+        Run leaps until time passes `until` or at least `max_events` events have happened.
+
+        :return: number of events run
+        """
+        start = self.events
+        while self.time < until and (max_events is None or self.events - start < max_events):
+            if not self.__step(until):
+                # Every type has died out
+                self.time = until
+            self.max_sizes = np.maximum(self.max_sizes, self.sizes)
+            if self.history is not None:
+                self.history.record(self.time, self.sizes.tolist(), None)
+        return self.events - start
+
+    def __step(self, until: float) -> bool:
+        n = self.sizes
+        a_birth = self.__birth_rates * n
+        a_death = self.__death_rates * n
+        a_total = a_birth.sum() + a_death.sum()
+        if a_total == 0:
+            return False
+
+        critical = n < self.critical
+        tau_leap = self.__leap_length(n, a_birth * ~critical, a_death * ~critical)
+        if tau_leap < SSA_FACTOR / a_total:
+            for _ in range(SSA_STEPS):
+                if self.time >= until or not self.__exact():
+                    break
+            return True
+
+        # Time to the next event among the exactly simulated types
+        a_critical = a_birth[critical].sum() + a_death[critical].sum()
+        tau_critical = self.__rng.exponential(1.0 / a_critical) if a_critical > 0 else np.inf
+
+        while True:
+            tau = min(tau_leap, tau_critical, until - self.time)
+            leapt = self.__leap(tau, a_birth * ~critical, a_death * ~critical)
+            if leapt is not None:
+                break
+            # A type would go negative, so try again with half the step
+            tau_leap = tau / 2.0
+        self.sizes = leapt
+        self.time += tau
+        if tau == tau_critical:
+            self.__exact(critical)
+        return True
+
+    def __leap_length(self, n: np.ndarray, a_birth: np.ndarray, a_death: np.ndarray) -> float:
+        # Largest step where no type is expected to change by more than epsilon of its size,
+        # counting births that mutate into it from the leapt types
+        inflow = np.bincount(self.__mutation_targets_flat, weights=a_birth[self.__mutation_sources] *
+                             self.__mutation_probability_flat, minlength=len(n))
+        bound = np.maximum(self.epsilon * n, 1.0)
+        mean = np.abs(inflow - a_death)
+        variance = inflow + a_death
+        with np.errstate(divide='ignore'):
+            return float(min(np.min(bound / mean), np.min(bound ** 2 / variance)))
+
+    def __leap(self, tau: float, a_birth: np.ndarray, a_death: np.ndarray) -> Optional[np.ndarray]:
+        births = self.__rng.poisson(a_birth * tau)
+        deaths = self.__rng.poisson(a_death * tau)
+        n = self.sizes - deaths
+        for i in np.flatnonzero(births):
+            n[self.__mutation_targets[i]] += self.__rng.multinomial(births[i], self.__mutation_rows[i])
+        if (n < 0).any():
+            return None
+
+        # Births over the population maximum are paired with deaths chosen by death propensity
+        excess = n.sum() - self.pop_max
+        removed = 0
+        while excess > removed:
+            w = self.__death_rates * n
+            if w.sum() == 0:
+                break
+            k = np.minimum(self.__rng.multinomial(excess - removed, w / w.sum()), n)
+            n -= k
+            removed += k.sum()
+
+        self.events += int(births.sum() + deaths.sum() + removed)
+        return n
+
+    def __exact(self, allowed: np.ndarray = None) -> bool:
+        # Run one event of the direct method, among only the allowed types if given.
+        # Time is only moved forwards when choosing among all types, otherwise the leap already did
+        n = self.sizes
+        a_birth = self.__birth_rates * n
+        a_death = self.__death_rates * n
+        if allowed is not None:
+            a_birth = a_birth * allowed
+            a_death = a_death * allowed
+        birth_total = a_birth.sum()
+        total = birth_total + a_death.sum()
+        if total == 0:
+            return False
+        if allowed is None:
+            self.time += self.__rng.exponential(1.0 / total)
+
+        r = self.__rng.random() * total
+        if r < birth_total:
+            t = int(np.searchsorted(np.cumsum(a_birth), r, side='right'))
+            if n.sum() >= self.pop_max:
+                d = self.__choose_death()
+                # Only update with death if types are different, otherwise they cancel
+                if d is not None and d != t:
+                    n[d] -= 1
+                    m = self.__mutate(t)
+                    # A type already updated this event cannot be born into
+                    if m != d:
+                        n[m] += 1
+            else:
+                n[self.__mutate(t)] += 1
+        else:
+            t = int(np.searchsorted(np.cumsum(a_death), r - birth_total, side='right'))
+            n[t] -= 1
+        self.events += 1
+        self.max_sizes = np.maximum(self.max_sizes, n)
+        return True
+
+    def __choose_death(self) -> Optional[int]:
+        cumulative = np.cumsum(self.__death_rates * self.sizes)
+        if cumulative[-1] == 0:
+            return None
+        return int(np.searchsorted(cumulative, self.__rng.random() * cumulative[-1], side='right'))
+
+    def __mutate(self, t: int) -> int:
+        return self.landscape.sample_mutation(t, self.__rng.random())
+
+    def setstate(self, state: Dict) -> None:
+        super().setstate(state)
+        self.sizes = np.array(state['sizes'], dtype=self.landscape.initial_sizes.dtype)
+        self.max_sizes = np.array(state['max_sizes'], dtype=self.landscape.initial_sizes.dtype)
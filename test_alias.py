@@ -0,0 +1,67 @@
+import math
+
+import pytest
+
+from alias import AliasTable, alias_table
+from simulation_generator import Generator
+
+WEIGHTS = [[1.0], [1.0, 1.0, 1.0], [0.5, 0.0, 2.0, 0.25], [0.001, 0.001, 0.998], [3.0, 0.0, 0.0, 1.0, 7.0, 2.0]]
+
+
+class Fixed:
+    # Stands in for a random stream, handing out one given draw
+    def __init__(self, u: float):
+        self.u = u
+
+    def random(self) -> float:
+        return self.u
+
+
+def implied(probability, alias):
+    # Chance of each index, from a uniform column and the chance of keeping it
+    n = len(probability)
+    p = [0.0] * n
+    for i, (keep, other) in enumerate(zip(probability, alias)):
+        p[i] += keep / n
+        p[other] += (1.0 - keep) / n
+    return p
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_table_gives_weights(weights):
+    expected = [w / sum(weights) for w in weights]
+    assert all(math.isclose(a, b, abs_tol=1e-12) for a, b in zip(implied(*alias_table(weights)), expected))
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_sample_frequencies(weights):
+    table = AliasTable(weights)
+    n = 100000
+    counts = [0] * len(weights)
+    for k in range(n):
+        counts[table.sample((k + 0.5) / n)] += 1
+    for c, w in zip(counts, weights):
+        assert abs(c / n - w / sum(weights)) <= 2 * len(weights) / n
+        if w == 0:
+            assert c == 0
+
+
+def test_sample_bounds():
+    table = AliasTable([1.0, 2.0, 3.0])
+    assert table.sample(0.0) in range(3)
+    assert table.sample(math.nextafter(1.0, 0.0)) in range(3)
+
+
+@pytest.mark.parametrize('weights', [[], [0.0, 0.0]])
+def test_no_weight(weights):
+    with pytest.raises(ValueError):
+        alias_table(weights)
+
+
+def test_landscape_samples_as_types():
+    sim = Generator().parameters(tuple('abc'), [tuple('ABC')], default_mutation_rate=0.01)
+    landscape = sim.get_landscape()
+    for i, t in enumerate(landscape.types):
+        for k in range(1000):
+            u = k / 1000
+            assert landscape.types[landscape.sample_mutation(i, u)] is t.choose_mutation(Fixed(u))
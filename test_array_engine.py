@@ -0,0 +1,38 @@
+import pytest
+
+from rng import replicate_seed
+from simulation import Simulation
+from stop_conditions import FinalDominance
+from type import Type
+
+
+@pytest.mark.parametrize('seed', [1, replicate_seed(4, 2)])
+@pytest.mark.parametrize('stop', [None, [FinalDominance(0.2)]])
+def test_same_draws_as_direct(landscape, outcome, seed, stop):
+    direct = landscape(seed=seed, history='event')
+    direct.run(10.0, stop=stop, check_every=100)
+    array = landscape(seed=seed, history='event', engine='array')
+    array.run(10.0, stop=stop, check_every=100)
+    assert outcome(array, path=True, history=True) == outcome(direct, path=True, history=True)
+
+
+def test_replicate_same_draws_as_direct(landscape):
+    direct = landscape(seed=replicate_seed(7, 3))
+    direct.run(10.0)
+    replicate = direct.replicate(seed=replicate_seed(7, 3))
+    replicate.run(10.0)
+    assert replicate.engine.events == direct.get_events()
+    assert list(replicate.sizes) == [t.size for t in direct.get_types()]
+    assert [direct.get_types()[i].name for i in replicate.dominant_path()] == \
+        [t.name for t in direct.get_dominant_path()]
+
+
+@pytest.mark.parametrize('engine', ['direct', 'array', 'next_reaction', 'tau', 'hybrid'])
+def test_extinction_runs_to_the_end(engine):
+    sim = Simulation([Type('A', 3, 0.0, 5.0)], engine=engine, seed=1)
+    sim.run(2.0)
+    assert sim.get_stop_time() == 2.0
+    assert [t.size for t in sim.get_types()] == [0]
+    replicate = sim.replicate(seed=1)
+    replicate.run(2.0)
+    assert replicate.stop_time == 2.0
@@ -0,0 +1,30 @@
+import pytest
+
+from rng import replicate_seed
+from stop_conditions import FinalDominance
+
+ENGINES = ['direct', 'array', 'next_reaction', 'tau', 'hybrid']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('history', [False, 'event', 'grid'])
+def test_restore_is_exact(tmp_path, landscape, outcome, engine, history):
+    options = dict(engine=engine, seed=replicate_seed(1, 2), history=history, history_interval=0.1)
+    filename = str(tmp_path / 'run.ckpt')
+    stop = [FinalDominance(0.5)]
+    full = landscape(checkpoint_file=filename, checkpoint_interval=0.7, **options)
+    full.run(10.0, stop=stop, check_every=100)
+
+    restored = landscape(**options)
+    restored.restore(filename)
+    restored.run(10.0, stop=stop, check_every=100)
+    assert outcome(restored, history=bool(history)) == outcome(full, history=bool(history))
+
+
+def test_restore_other_simulation(tmp_path, landscape):
+    filename = str(tmp_path / 'run.ckpt')
+    sim = landscape(seed=1)
+    sim.run(1.0)
+    sim.checkpoint(filename)
+    with pytest.raises(ValueError):
+        landscape(seed=1, engine='array').restore(filename)
@@ -0,0 +1,48 @@
+import math
+import random
+
+from indexed_heap import IndexedHeap
+
+
+def drain(heap):
+    # Keys in the order the heap hands them out, taking each top out by setting it to infinity
+    order = []
+    for _ in range(len(heap)):
+        i, key = heap.top()
+        if key == math.inf:
+            break
+        order.append((key, i))
+        heap.set(i, math.inf)
+    return order
+
+
+def test_initial_order():
+    keys = [3.0, 1.0, 2.0, 0.5]
+    heap = IndexedHeap(keys)
+    assert heap.top() == (3, 0.5)
+    assert [k for k, _ in drain(heap)] == sorted(keys)
+
+
+def test_order_after_set():
+    rng = random.Random(2)
+    for n in (1, 2, 5, 16, 31):
+        keys = [rng.random() for _ in range(n)]
+        heap = IndexedHeap(keys)
+        for _ in range(200):
+            i = rng.randrange(n)
+            keys[i] = rng.choice((rng.random(), math.inf, keys[i], keys[rng.randrange(n)]))
+            heap.set(i, keys[i])
+            assert heap.top()[1] == min(keys)
+            assert keys[heap.top()[0]] == min(keys)
+            assert [heap[j] for j in range(n)] == keys
+        finite = sorted(k for k in keys if k != math.inf)
+        assert [k for k, _ in drain(heap)] == finite
+
+
+def test_equal_keys():
+    heap = IndexedHeap([1.0, 1.0, 1.0])
+    heap.set(1, 0.0)
+    assert heap.top() == (1, 0.0)
+    heap.set(1, 1.0)
+    assert heap.top()[1] == 1.0
+    assert sorted(i for _, i in drain(heap)) == [0, 1, 2]
@@ -0,0 +1,33 @@
+import functools
+
+import pytest
+
+
+@pytest.fixture
+def small(landscape):
+    # Reaches its population maximum quickly, with mutations common enough that the child of a paired
+    # birth is often the type that died
+    return functools.partial(landscape, genes='ab', size=30, mutation_rate=0.3)
+
+
+@pytest.mark.parametrize('sample', [1, 7])
+def test_counted_cycle_matches_cycle(small, outcome, sample):
+    plain = small(seed=11, history='event')
+    plain.run(20.0)
+    counted = small(seed=11, history='event', instrument=True, instrument_sample=sample)
+    counted.run(20.0)
+    assert outcome(counted, history=True) == outcome(plain, history=True)
+
+
+def test_counts_add_up_to_sizes(small):
+    sim = small(seed=3, instrument=True)
+    start = sum(t.size for t in sim.get_types())
+    report = sim.run(20.0)
+    kinds = report['kinds']
+    assert kinds['cancelled'] > 0
+    assert sum(kinds[k] for k in ('birth', 'death', 'paired', 'cancelled', 'nothing')) == report['events']
+    births = sum(v['births'] for v in report['types'].values())
+    deaths = sum(v['deaths'] for v in report['types'].values())
+    assert births == kinds['birth'] + kinds['paired']
+    # A birth cancelled by its child being of the type that died still leaves that death
+    assert start + births - deaths == sum(t.size for t in sim.get_types())
@@ -0,0 +1,67 @@
+import glob
+import itertools
+
+import pytest
+
+from simulation import Simulation
+from simulation_generator import Generator
+from type import Type
+
+
+def reference(wildtype, mutated, rates=False, default_rate=(0.0, 1.0), mutation_rates=False,
+              default_mutation_rate=0.001, wildtype_size=None, size=200):
+    # The landscape as built before sequences were integer encoded, comparing every pair of sequences
+    rates = rates or {}
+    mutation_rates = mutation_rates or {}
+    wildtype_size = wildtype_size or size
+    all_seq = Generator.remove_duplicates(itertools.product(*zip(wildtype, *mutated)))
+
+    def neighbours(source):
+        return {t for t in all_seq if sum(a != b for a, b in zip(source, t)) == 1}
+
+    types = {seq: Type(''.join(seq), wildtype_size if seq == wildtype else 0, *rates.get(seq, default_rate))
+             for seq in [wildtype] + all_seq}
+    sources, used, finals = {wildtype}, set(), []
+    for i in range(len(wildtype) + 1):
+        finals = sources
+        for s, source in enumerate(sorted(sources, key=''.join, reverse=True)):
+            types[source].pos = (i, s / len(sources))
+            for target in sorted(neighbours(source) - used, key=all_seq.index):
+                types[source].add_mutation(types[target], mutation_rates.get(Generator.Mutation(source, target),
+                                                                             default_mutation_rate))
+                types[target].add_mutation(types[source], mutation_rates.get(Generator.Mutation(target, source),
+                                                                             default_mutation_rate))
+                types[source].add_child(types[target])
+                types[target].add_parent(types[source])
+        used |= sources
+        sources = set().union(*map(neighbours, sources)) - used
+    return Simulation(list(types.values()), max=size, wildtype=types[wildtype], finals=[types[t] for t in finals])
+
+
+def describe(sim):
+    return ([(t.name, t.initial_size, t.full_name, t.pos, [(m.name, p) for m, p in t.mutations],
+              [c.name for c in t.children], [p.name for p in t.parents]) for t in sim.get_types()],
+            sim.wildtype.name, sorted(t.name for t in sim.finals), sim.get_pop_max())
+
+
+def parsed(filename):
+    # A config file as `Generator.config_file` passes it to `parameters`
+    config = Generator.read_config(filename)
+    return dict(config, wildtype=tuple(config['wildtype']), mutated=[tuple(m) for m in config['mutated']],
+                rates={tuple(k): tuple(v) for k, v in config.get('rates', {}).items()},
+                default_rate=tuple(config['default_rate']))
+
+
+@pytest.mark.parametrize('filename', sorted(glob.glob('config/*.json')) + ['config/two_paths_ABC_D/0_00.json'])
+def test_config_graph_unchanged(filename):
+    assert describe(Generator().config_file(filename)) == describe(reference(**parsed(filename)))
+
+
+@pytest.mark.parametrize('wildtype, mutated', [('a', ['A']), ('abc', ['ABC']), ('ab', ['AB', 'Cb']),
+                                               ('abcd', ['ABCD', 'aBcE'])])
+def test_graph_unchanged(wildtype, mutated):
+    mutated = [tuple(m) for m in mutated]
+    # One mutation with its own rate, from the wildtype at the first locus
+    mutation_rates = {Generator.Mutation(tuple(wildtype), mutated[0][:1] + tuple(wildtype[1:])): 0.5}
+    assert describe(Generator().parameters(tuple(wildtype), mutated, mutation_rates=mutation_rates)) == \
+        describe(reference(tuple(wildtype), mutated, mutation_rates=mutation_rates))
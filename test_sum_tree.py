@@ -0,0 +1,62 @@
+import itertools
+import random
+
+from sum_tree import SumTree
+
+
+def linear_find(weights, x):
+    # First index whose cumulative weight is greater than x, the scan the tree replaces
+    for i, c in enumerate(itertools.accumulate(weights)):
+        if c > x:
+            return i
+    return len(weights)
+
+
+def test_zero_weights_are_never_found():
+    tree = SumTree([0.0, 1.0, 0.0, 2.0, 0.0])
+    assert tree.find(0.0) == 1
+    assert tree.find(0.999) == 1
+    assert tree.find(1.0) == 3
+    assert tree.find(2.999) == 3
+
+
+def test_bounds():
+    tree = SumTree([0.0, 1.0, 0.0, 2.0, 0.0])
+    assert tree.total == 3.0
+    # At or past the total nothing is found
+    assert tree.find(3.0) == len(tree)
+    assert tree.find(10.0) == len(tree)
+    assert SumTree([0.0, 0.0, 0.0]).find(0.0) == 3
+    assert SumTree([]).find(0.0) == 0
+
+
+def test_single_weight():
+    tree = SumTree([4.0])
+    assert tree.find(0.0) == 0
+    assert tree.find(3.999) == 0
+    assert tree.find(4.0) == 1
+
+
+def test_matches_linear_scan_after_set():
+    rng = random.Random(1)
+    for n in (1, 2, 3, 7, 8, 9, 33):
+        weights = [rng.choice((0.0, rng.randint(1, 9))) for _ in range(n)]
+        tree = SumTree(weights)
+        for _ in range(50):
+            i = rng.randrange(n)
+            weights[i] = rng.choice((0.0, float(rng.randint(1, 9))))
+            tree.set(i, weights[i])
+            assert tree.total == sum(weights)
+            assert [tree[j] for j in range(n)] == weights
+            for x in range(int(sum(weights)) + 1):
+                assert tree.find(float(x)) == linear_find(weights, x)
+
+
+def test_rebuild_keeps_weights():
+    tree = SumTree([0.1] * 10)
+    for _ in range(1000):
+        tree.set(3, 0.7)
+        tree.set(3, 0.1)
+    tree.rebuild()
+    assert tree.total == sum([0.1] * 10)
+    assert tree.find(0.35) == 3
@@ -5,6 +5,8 @@ from typing import List, Tuple
 import numpy as np
 from deprecated import deprecated
 
+from alias import AliasTable
+
 
 class Event(Enum):
     NOTHING = 0
@@ -42,6 +44,8 @@ class Type:
 
         self.mutations = list()
         self.mutation_total = 0.0
+        # Sampler of the mutations, built when they're complete
+        self.mutation_alias: AliasTable = None
         # Initialise with no mutation options except self
         # self.add_mutation(self, 1.0)
 
@@ -60,6 +64,7 @@ class Type:
         if len(relations) < len(all_types):
             raise Exception('A mutation isn\'t mentioned in the parents or children')
         self.add_self_mutation()
+        self.mutation_alias = AliasTable([p for _, p in self.mutations])
 
     def update(self, op: Event, time: float, mutate: bool = True) -> int:
         # Check that you haven't already been updated for this time
@@ -115,18 +120,21 @@ class Type:
 
     def set_mutation_total(self):
         self.mutation_total = sum([m[1] for m in self.mutations])
+        self.mutation_alias = None
 
     def find_mutation(self, time: float) -> int:
-        r = random.uniform(0., self.mutation_total)
-        total = 0.
-        # Loop through mutations
-        for e, p in self.mutations:
-            total += p
-            # If argument is within the new total, we've found the mutation it applies to
-            if r < total:
-                # A mutation event cannot itself mutate
-                return e.update(Event.BIRTH, time, False)
-        assert False, 'Shouldn\'t get here'
+        # A mutation event cannot itself mutate
+        return self.choose_mutation().update(Event.BIRTH, time, False)
+
+    def choose_mutation(self, rng=random) -> 'Type':
+        """
+        Chooses a mutation target in O(1) from an alias table, whatever the number of targets.
+
+        :param rng: source of uniform random numbers with a `random()` method, e.g. a `RandomStream`
+        """
+        if self.mutation_alias is None:
+            self.mutation_alias = AliasTable([p for _, p in self.mutations])
+        return self.mutations[self.mutation_alias.sample(rng.random())][0]
 
     # @property
     # def get_sizes(self) -> List[float]:
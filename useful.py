@@ -4,6 +4,7 @@ from os.path import isfile, join
 from time import strftime
 from typing import List
 
+import results
 from simulation import Simulation
 from type import Type
 
@@ -34,7 +35,7 @@ def load_paths(name: str) -> List[List[Type]]:
         name += '.sim'
     print('opening ' + name)
     with open(name, 'rb') as f:
-        return pickle.load(f)
+        return results.to_paths(pickle.load(f))
 
 
 def load_paths_ambiguous(directory: str, part_name: str) -> List[List[Type]]:
@@ -49,4 +50,4 @@ def load_paths_ambiguous(directory: str, part_name: str) -> List[List[Type]]:
     with open(join(directory, files[0]), 'rb') as f:
         p = pickle.load(f)
 
-    return p
+    return results.to_paths(p)